@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+
+# Copyright 2022 Stephen L Arnold
+#
+# This is free software, licensed under the LGPL-2.1 license
+# available in the accompanying LICENSE file.
+
+"""
+Benchmark the main repolite code paths (clone, update, show, lock, tag,
+and changelog) against a synthetic workspace of local bare repositories,
+ie, no network access is needed. Results can be saved as a baseline and
+later runs compared against it to flag regressions.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess as sp
+import sys
+import time
+from pathlib import Path
+from shutil import rmtree, which
+from tempfile import mkdtemp
+
+from repolite.repolite import (
+    check_for_git,
+    create_locked_cfg,
+    create_repo_tags,
+    parse_config,
+    process_git_repos,
+    process_repo_changes,
+    show_repo_state,
+)
+from repolite.spec import build_config
+
+AUTHOR_NAME = 'Bench User'
+AUTHOR_EMAIL = 'bench@example.com'
+AUTHOR = f'{AUTHOR_NAME} <{AUTHOR_EMAIL}>'
+LOG = logging.getLogger('bench')
+
+
+def fast_import_stream(commits, branches, tags, files, start=0, parent=None):
+    """
+    Build a ``git fast-import`` stream with a linear main branch, plus
+    branches and annotated tags spread across the commit history.
+
+    :param commits: number of commits on main
+    :type commits: int
+    :param branches: number of extra branches
+    :type branches: int
+    :param tags: number of annotated tags
+    :type tags: int
+    :param files: number of files changed per commit
+    :type files: int
+    :param start: first commit number (for appending commits)
+    :type start: int
+    :param parent: parent ref for the first commit (for appending commits)
+    :type parent: str or None
+    :return stream: fast-import data
+    :rtype: bytes
+    """
+    lines = []
+    stamp = 1600000000 + start * 60
+    branch_at = {commits * (i + 1) // (branches + 1): i for i in range(branches)}
+    tag_at = {commits * (i + 1) // (tags + 1): i for i in range(tags)}
+    for num in range(1, commits + 1):
+        idx = start + num
+        msg = f'Synthetic commit #{idx}\n'.encode()
+        lines.append(b'commit refs/heads/main')
+        lines.append(f'mark :{num}'.encode())
+        lines.append(f'committer {AUTHOR} {stamp + num * 60} +0000'.encode())
+        lines.append(f'data {len(msg)}'.encode() + b'\n' + msg)
+        if num == 1 and parent:
+            lines.append(f'from {parent}'.encode())
+        for fnum in range(files):
+            data = f'{idx}:{fnum}\n'.encode()
+            path = f'dir{fnum % 10}/file{fnum}.txt'
+            lines.append(f'M 100644 inline {path}'.encode())
+            lines.append(f'data {len(data)}'.encode() + b'\n' + data)
+        lines.append(b'')
+        if num in branch_at:
+            lines.append(f'reset refs/heads/branch{branch_at[num]}'.encode())
+            lines.append(f'from :{num}\n'.encode())
+        if num in tag_at:
+            tag_msg = f'Release {tag_at[num]}\n'.encode()
+            lines.append(f'tag 0.{tag_at[num]}.0'.encode())
+            lines.append(f'from :{num}'.encode())
+            lines.append(f'tagger {AUTHOR} {stamp + num * 60} +0000'.encode())
+            lines.append(f'data {len(tag_msg)}'.encode() + b'\n' + tag_msg)
+    return b'\n'.join(lines) + b'\n'
+
+
+def make_remote(path, opts):
+    """
+    Create a synthetic bare repository using ``git fast-import``.
+
+    :param path: bare repository path
+    :type path: Path obj
+    :param opts: scale options (commits, branches, tags, files)
+    :type opts: Namespace
+    """
+    sp.check_call(['git', 'init', '-q', '--bare', '-b', 'main', str(path)])
+    stream = fast_import_stream(opts.commits, opts.branches, opts.tags, opts.files)
+    sp.run(['git', 'fast-import', '--quiet'], input=stream, cwd=path, check=True)
+
+
+def add_remote_commits(path, count, start, files):
+    """
+    Append new commits to main in a synthetic bare repository.
+
+    :param path: bare repository path
+    :type path: Path obj
+    :param count: number of new commits
+    :type count: int
+    :param start: number of existing commits
+    :type start: int
+    :param files: number of files changed per commit
+    :type files: int
+    """
+    stream = fast_import_stream(
+        count, 0, 0, files, start=start, parent='refs/heads/main^0'
+    )
+    sp.run(['git', 'fast-import', '--quiet'], input=stream, cwd=path, check=True)
+
+
+def make_config(work_dir, remotes):
+    """
+    Build a repolite config for the synthetic remotes, with the default
+    global settings (ie, independent of any config in the current dir).
+
+    :param work_dir: benchmark working directory
+    :type work_dir: Path obj
+    :param remotes: list of bare repository paths
+    :type remotes: list
+    :return ucfg: Munch configuration object
+    :rtype: Munch cfgobj
+    """
+    from munch import Munch
+
+    cfg_data = {
+        'top_dir': str(work_dir / 'ext'),
+        'repos': [
+            {
+                'repo_name': x.stem,
+                'repo_url': str(x),
+                'repo_branch': 'main',
+                'repo_gen_changes': True,
+            }
+            for x in remotes
+        ],
+    }
+    return Munch(build_config(cfg_data))
+
+
+def timed(results, name, func, *args, **kwargs):
+    """
+    Run a benchmark step and record the elapsed time.
+
+    :param results: dict of step name: seconds
+    :type results: dict
+    :param name: step name
+    :type name: str
+    :param func: callable to benchmark
+    """
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    results[name] = round(time.perf_counter() - start, 4)
+    LOG.info('%-16s %8.3f s', name, results[name])
+
+
+def run_benchmarks(opts, work_dir):
+    """
+    Create the synthetic workspace and time each code path.
+
+    :param opts: parsed cmd line options
+    :type opts: Namespace
+    :param work_dir: benchmark working directory
+    :type work_dir: Path obj
+    :return results: dict of step name: seconds
+    :rtype: dict
+    """
+    # the tag step needs a committer identity (eg, on CI hosts)
+    os.environ['GIT_COMMITTER_NAME'] = AUTHOR_NAME
+    os.environ['GIT_COMMITTER_EMAIL'] = AUTHOR_EMAIL
+    remote_dir = work_dir / 'remotes'
+    remote_dir.mkdir(parents=True)
+    remotes = [remote_dir / f'repo{num:03d}.git' for num in range(opts.repos)]
+    start = time.perf_counter()
+    for remote in remotes:
+        make_remote(remote, opts)
+    LOG.info('Generated %d repos in %.3f s', opts.repos, time.perf_counter() - start)
+
+    ucfg = make_config(work_dir, remotes)
+    flags, repos = parse_config(ucfg)
+    _, lfs_cmd = check_for_git()
+    flags.extend([lfs_cmd, False])
+    ufile = work_dir / 'bench.yml'
+
+    results = {}
+    timed(results, 'clone', process_git_repos, flags, repos, False, True, opts.jobs)
+    timed(results, 'update', process_git_repos, flags, repos, True, True, opts.jobs)
+    for remote in remotes:
+        add_remote_commits(remote, opts.new_commits, opts.commits, opts.files)
+    timed(results, 'update_new', process_git_repos, flags, repos, True, True, opts.jobs)
+    timed(results, 'show', show_repo_state, ucfg, opts.jobs)
+    if which('gitchangelog'):
+        timed(results, 'changelog', process_repo_changes, ucfg, opts.jobs)
+        timed(results, 'changelog_cached', process_repo_changes, ucfg, opts.jobs)
+    else:
+        LOG.warning('gitchangelog not found; skipping changelog benchmark')
+    timed(results, 'tag', create_repo_tags, ucfg, '9.9.9', True, opts.jobs)
+    timed(results, 'lock', create_locked_cfg, ucfg, ufile, True, str(work_dir))
+    return results
+
+
+def compare_results(results, baseline, threshold):
+    """
+    Compare benchmark results to a baseline and return the regressions,
+    ie, steps slower than the baseline by more than ``threshold``.
+
+    :param results: dict of step name: seconds
+    :type results: dict
+    :param baseline: baseline data with ``results`` dict
+    :type baseline: dict
+    :param threshold: allowed slowdown ratio, eg, 1.25
+    :type threshold: float
+    :return regressions: list of (step, baseline, current) tuples
+    :rtype: list
+    """
+    regressions = []
+    for name, secs in results.items():
+        base_secs = baseline.get('results', {}).get(name)
+        if base_secs and secs > base_secs * threshold:
+            regressions.append((name, base_secs, secs))
+    return regressions
+
+
+def main(argv=None):
+    """
+    Run the benchmarks, then save or compare against a baseline.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument('--repos', type=int, default=10, help='Number of repositories')
+    parser.add_argument('--commits', type=int, default=200, help='Commits per repository')
+    parser.add_argument(
+        '--branches', type=int, default=5, help='Extra branches per repository'
+    )
+    parser.add_argument(
+        '--tags', type=int, default=20, help='Annotated tags per repository'
+    )
+    parser.add_argument('--files', type=int, default=5, help='Files changed per commit')
+    parser.add_argument(
+        '--new-commits', type=int, default=5, help='Commits added before the 2nd update'
+    )
+    parser.add_argument('--jobs', type=int, default=None, help='Parallel jobs')
+    parser.add_argument(
+        '--baseline',
+        type=Path,
+        default=Path('benchmarks', 'baseline.json'),
+        help='Baseline results file',
+    )
+    parser.add_argument(
+        '--save', action='store_true', help='Save results as the baseline'
+    )
+    parser.add_argument(
+        '--threshold', type=float, default=1.25, help='Allowed slowdown vs baseline'
+    )
+    parser.add_argument(
+        '--keep', action='store_true', help='Keep the benchmark workspace'
+    )
+    opts = parser.parse_args(argv)
+
+    logging.basicConfig(stream=sys.stdout, level=logging.WARNING)
+    LOG.setLevel(logging.INFO)
+
+    work_dir = Path(mkdtemp(prefix='repolite-bench-'))
+    cur_dir = Path.cwd()
+    try:
+        results = run_benchmarks(opts, work_dir)
+    finally:
+        os.chdir(cur_dir)
+        if opts.keep:
+            print(f'Workspace: {work_dir}')
+        else:
+            rmtree(work_dir, ignore_errors=True)
+
+    scale = {
+        k: getattr(opts, k) for k in ('repos', 'commits', 'branches', 'tags', 'files')
+    }
+    scale['jobs'] = opts.jobs
+    data = {'python': platform.python_version(), 'scale': scale, 'results': results}
+    print(json.dumps(data, indent=2, sort_keys=True))
+
+    if opts.save:
+        opts.baseline.parent.mkdir(parents=True, exist_ok=True)
+        opts.baseline.write_text(
+            json.dumps(data, indent=2, sort_keys=True), encoding='utf-8'
+        )
+        print(f'Saved baseline: {opts.baseline}')
+        return 0
+    if not opts.baseline.exists():
+        print(f'No baseline found: {opts.baseline} (use --save to create one)')
+        return 0
+
+    baseline = json.loads(opts.baseline.read_text(encoding='utf-8'))
+    if baseline.get('scale') != scale:
+        print('Warning: baseline scale differs from this run')
+    regressions = compare_results(results, baseline, opts.threshold)
+    for name, base_secs, secs in regressions:
+        print(f'REGRESSION {name}: {base_secs:.3f} s -> {secs:.3f} s')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,12 +5,21 @@ config file(s).
 
 import sys
 
-if sys.version_info < (3, 8):
-    from importlib_metadata import version
-else:
-    from importlib.metadata import version
-
-__version__ = version('repolite')
 __all__ = [
     "__version__",
 ]
+
+
+def __getattr__(name):
+    """
+    Look up ``__version__`` on first use (importlib.metadata is slow to
+    import and most commands do not need it).
+    """
+    if name == '__version__':
+        if sys.version_info < (3, 8):
+            from importlib_metadata import version
+        else:
+            from importlib.metadata import version
+
+        return version('repolite')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,382 @@
+# Copyright 2022 Stephen L Arnold
+#
+# This is free software, licensed under the LGPL-2.1 license
+# available in the accompanying LICENSE file.
+
+"""
+Optional long-running server for read-mostly queries. The daemon loads
+the config once, keeps a ``git cat-file --batch-check`` helper running for
+each repository, and answers show, lock, has-tag, and state-check requests
+over a unix socket next to the config file. The CLI sends these requests
+to the daemon when it is running (for the same config file and working
+directory) and falls back to running them locally otherwise.
+
+The socket is only accessible by its owner (mode 0600), and the CLI only
+talks to a socket owned by the current user.
+
+The protocol is one JSON request line and one JSON response line per
+connection; responses have ``ok`` set to ``false`` and an ``error`` string
+if the request failed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import subprocess as sp
+import tempfile
+import threading
+from pathlib import Path
+
+from .tracing import run_traced
+
+SOCK_SUFFIX = '.sock'
+MAX_SOCK_PATH = 100
+DAEMON_TIMEOUT = 60
+
+
+def get_socket_path(cfgfile):
+    """
+    Get the daemon socket path for a config file, ie, a hidden file next to
+    the config, or a file in a per-user directory in the temp dir if that
+    path is too long for a unix socket.
+
+    :param cfgfile: config file path
+    :type cfgfile: Path obj
+    :return sock_path: socket path
+    :rtype: Path obj
+    """
+    cfg_path = Path(cfgfile).resolve()
+    sock_path = cfg_path.with_name(f'.{cfg_path.name.lstrip(".")}{SOCK_SUFFIX}')
+    if len(os.fsencode(str(sock_path))) > MAX_SOCK_PATH:
+        digest = hashlib.sha256(os.fsencode(str(cfg_path))).hexdigest()[:16]
+        sock_dir = Path(tempfile.gettempdir(), f'repolite-{os.getuid()}')
+        sock_path = sock_dir / f'{digest}{SOCK_SUFFIX}'
+    return sock_path
+
+
+def daemon_request(sock_path, request, timeout=DAEMON_TIMEOUT):
+    """
+    Send a request to the daemon and return the response.
+
+    :param sock_path: daemon socket path
+    :type sock_path: Path obj
+    :param request: request data, ie, ``cmd`` plus arguments
+    :type request: dict
+    :param timeout: socket timeout in seconds
+    :type timeout: float
+    :return response: response data, or None if no daemon is listening
+                     (or the socket is owned by another user)
+    :rtype: dict or None
+    """
+    import socket
+
+    try:
+        sock_stat = os.stat(sock_path)
+    except OSError:
+        return None
+    if sock_stat.st_uid != os.getuid():
+        logging.warning(
+            'Ignoring socket owned by uid %d: %s', sock_stat.st_uid, sock_path
+        )
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(timeout)
+            conn.connect(str(sock_path))
+            conn.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            with conn.makefile('rb') as reader:
+                data = reader.readline()
+    except OSError as exc:
+        logging.debug('No daemon at %s: %s', sock_path, exc)
+        return None
+    if not data:
+        return None
+    return json.loads(data)
+
+
+class CatFile:
+    """
+    Persistent ``git cat-file --batch-check`` helper for one repository,
+    used to resolve names (eg, ``HEAD`` or a full ref) without a new git
+    process per query. Safe to use from multiple threads.
+
+    :param repo_dir: path to repository directory
+    :type repo_dir: Path obj
+    """
+
+    def __init__(self, repo_dir):
+        self.repo_dir = repo_dir
+        self.proc = None
+        self.lock = threading.Lock()
+
+    def _start(self):
+        self.proc = sp.Popen(
+            ['git', 'cat-file', '--batch-check'],
+            cwd=self.repo_dir,
+            stdin=sp.PIPE,
+            stdout=sp.PIPE,
+            stderr=sp.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+
+    def resolve(self, name):
+        """
+        Resolve a name to an object hash.
+
+        :param name: object name, eg, ``HEAD`` or ``refs/tags/1.0``
+        :type name: str
+        :return obj_hash: object hash or None if missing
+        :rtype: str or None
+        :raises OSError: if the helper cannot be started or has died
+        """
+        if not name or any(x.isspace() for x in name):
+            return None
+        with self.lock:
+            if self.proc is None or self.proc.poll() is not None:
+                self._start()
+            try:
+                self.proc.stdin.write(name + '\n')
+                self.proc.stdin.flush()
+                line = self.proc.stdout.readline()
+            except (OSError, ValueError) as exc:
+                self.close()
+                raise OSError(f'cat-file helper failed in {self.repo_dir}') from exc
+        if not line:
+            self.close()
+            raise OSError(f'cat-file helper exited in {self.repo_dir}')
+        fields = line.split()
+        return None if fields[-1] == 'missing' else fields[0]
+
+    def close(self):
+        """
+        Stop the helper process.
+        """
+        proc, self.proc = self.proc, None
+        if proc is None:
+            return
+        if proc.stdin:
+            proc.stdin.close()
+        try:
+            proc.wait(timeout=5)
+        except sp.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+
+
+class RepoDaemon:
+    """
+    Serve repolite queries for one config file over a unix socket.
+
+    :param cfgfile: active config file
+    :type cfgfile: Path obj
+    :param sock_path: socket path (default from ``get_socket_path``)
+    :type sock_path: Path obj or None
+    :param jobs: number of repositories to query in parallel
+    :type jobs: int or None
+    """
+
+    def __init__(self, cfgfile, sock_path=None, jobs=None):
+        self.cfgfile = Path(cfgfile).resolve()
+        self.sock_path = sock_path or get_socket_path(self.cfgfile)
+        self.work_dir = Path.cwd().resolve()
+        self.jobs = jobs
+        self.server = None
+        self.helpers = {}
+        self.lock = threading.Lock()
+        self.cfg = None
+        self.cfg_stamp = None
+        self.load()
+
+    def load(self):
+        """
+        (Re)load the config file if it changed since the last load.
+        """
+        from .repolite import load_config
+
+        stat = self.cfgfile.stat()
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            if stamp == self.cfg_stamp:
+                return
+            cfg, _ = load_config()
+            self.cfg, self.cfg_stamp = cfg, stamp
+            dir_names = {x.repo_alias if x.repo_alias else x.repo_name for x in cfg.repos}
+            for name in list(self.helpers):
+                if name not in dir_names:
+                    self.helpers.pop(name).close()
+            logging.info('Loaded config: %s (%d repos)', self.cfgfile, len(cfg.repos))
+
+    def get_helper(self, repo_dir):
+        """
+        Get (or create) the cat-file helper for a repository.
+        """
+        with self.lock:
+            if repo_dir.name not in self.helpers:
+                self.helpers[repo_dir.name] = CatFile(repo_dir)
+            return self.helpers[repo_dir.name]
+
+    def select(self, request):
+        """
+        Get a private copy of the config with the request selectors applied.
+
+        :param request: request data with optional ``only``, ``groups``, and
+                        ``match`` selectors
+        :type request: dict
+        :return ucfg: Munch configuration object
+        :rtype: Munch cfgobj
+        """
+        from munch import Munch
+
+        from .spec import RepoSpec, select_repos
+
+        ucfg = Munch(self.cfg)
+        ucfg.repos = [RepoSpec(**x.to_dict()) for x in self.cfg.repos]
+        select_repos(
+            ucfg.repos, request.get('only'), request.get('groups'), request.get('match')
+        )
+        return ucfg
+
+    def handle(self, request):
+        """
+        Handle one request, ie, ``ping``, ``stop``, ``check``, ``show``,
+        ``has-tag`` (with ``tag``), or ``lock`` (with optional ``test`` dir).
+
+        :param request: request data
+        :type request: dict
+        :return response: response data
+        :rtype: dict
+        """
+        from .repolite import (
+            compare_repo_dirs,
+            enabled_repos,
+            get_repo_status,
+            list_repo_dirs,
+            map_repos,
+            resolve_top_dir,
+            write_locked_cfg,
+        )
+
+        cmd = request.get('cmd')
+        if cmd in ('ping', 'stop'):
+            return {'ok': True, 'pid': os.getpid(), 'config': str(self.cfgfile)}
+        if request.get('config') != str(self.cfgfile) or request.get('cwd') != str(
+            self.work_dir
+        ):
+            return {'ok': False, 'error': 'config or working directory mismatch'}
+        from .spec import RepoSpecError
+
+        try:
+            self.load()
+            ucfg = self.select(request)
+        except RepoSpecError as exc:
+            return {'ok': False, 'error': str(exc)}
+        _, top_dir = resolve_top_dir(self.work_dir / ucfg.top_dir)
+        repo_dirs = [
+            top_dir / str(x.repo_alias if x.repo_alias else x.repo_name)
+            for x in enabled_repos(ucfg.repos)
+        ]
+        if not top_dir.is_dir() or not compare_repo_dirs(ucfg, list_repo_dirs(top_dir)):
+            if cmd == 'check':
+                return {'ok': True, 'valid': False, 'top_dir': str(top_dir)}
+            return {'ok': False, 'error': 'inconsistent directories'}
+
+        if cmd == 'check':
+            return {'ok': True, 'valid': True, 'top_dir': str(top_dir)}
+        if cmd == 'show':
+            statuses = map_repos(get_repo_status, repo_dirs, self.jobs)
+            return {'ok': True, 'repos': [dict(x) for x in statuses]}
+        if cmd == 'has-tag':
+            ref_name = f'refs/tags/{request["tag"]}'
+            return {
+                'ok': True,
+                'repos': {
+                    x.name: self.get_helper(x).resolve(ref_name) is not None
+                    for x in repo_dirs
+                },
+            }
+        if cmd == 'lock':
+            heads = [self.get_helper(x).resolve('HEAD') for x in repo_dirs]
+            if None in heads:
+                return {'ok': False, 'error': 'cannot resolve HEAD'}
+            for repo_dir, head in zip(repo_dirs, heads):
+                run_traced(sp.check_call, ['git', 'checkout', '-q', head], cwd=repo_dir)
+            selected = dict(zip([x.name for x in repo_dirs], heads))
+            locked = {}
+            for item in ucfg.repos:
+                git_dir = item.repo_alias if item.repo_alias else item.repo_name
+                if git_dir in selected:
+                    item.repo_hash = selected[git_dir]
+                    locked[git_dir] = {
+                        'repo_hash': item.repo_hash,
+                        'branch': item.repo_branch,
+                    }
+            out_dir = request.get('test') or str(self.work_dir)
+            write_locked_cfg(ucfg, self.cfgfile, out_dir)
+            return {'ok': True, 'repos': locked}
+        return {'ok': False, 'error': f'unknown command: {cmd}'}
+
+    def serve(self):
+        """
+        Serve requests until stopped (see ``stop``) or interrupted.
+
+        :raises OSError: if another daemon is already running, or the temp
+                         socket directory is not private
+        """
+        import socketserver
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                request = None
+                try:
+                    request = json.loads(self.rfile.readline())
+                    response = daemon.handle(request)
+                except Exception as exc:  # pylint: disable=broad-except
+                    logging.exception('Request failed')
+                    response = {'ok': False, 'error': str(exc)}
+                self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+                if isinstance(request, dict) and request.get('cmd') == 'stop':
+                    threading.Thread(target=daemon.server.shutdown).start()
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        sock_dir = self.sock_path.parent
+        if sock_dir.parent == Path(tempfile.gettempdir()):
+            sock_dir.mkdir(mode=0o700, exist_ok=True)
+            dir_stat = sock_dir.lstat()
+            if dir_stat.st_uid != os.getuid() or dir_stat.st_mode & 0o077:
+                raise OSError(f'Socket directory is not private: {sock_dir}')
+        if daemon_request(self.sock_path, {'cmd': 'ping'}, timeout=5):
+            raise OSError(f'Daemon already running on {self.sock_path}')
+        if self.sock_path.is_socket():
+            self.sock_path.unlink()
+        # bind with mode 0600, ie, only we can connect
+        old_umask = os.umask(0o177)
+        try:
+            self.server = Server(str(self.sock_path), Handler)
+        finally:
+            os.umask(old_umask)
+        logging.info('Listening on %s', self.sock_path)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.stop()
+
+    def stop(self):
+        """
+        Remove the socket and stop the cat-file helpers.
+        """
+        try:
+            self.sock_path.unlink()
+        except OSError:
+            pass
+        with self.lock:
+            for helper in self.helpers.values():
+                helper.close()
+            self.helpers = {}
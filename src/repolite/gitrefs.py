@@ -0,0 +1,281 @@
+# Copyright 2022 Stephen L Arnold
+#
+# This is free software, licensed under the LGPL-2.1 license
+# available in the accompanying LICENSE file.
+
+"""
+Minimal pure-Python reader for git refs, ie, ``HEAD``, loose refs and
+``packed-refs`` (including ``.git`` file and worktree indirection). This
+is only meant for read-only ref lookups; anything it cannot resolve
+returns ``None`` so the caller can fall back to running git.
+"""
+
+import logging
+import zlib
+from pathlib import Path
+
+SHA_LEN = 40
+
+
+def _is_sha(value):
+    """
+    Return ``True`` if value looks like a (SHA-1) object name.
+    """
+    return len(value) == SHA_LEN and all(c in '0123456789abcdef' for c in value)
+
+
+def find_git_dir(repo_dir):
+    """
+    Find the git directory for a repository working directory, following
+    a ``.git`` file (``gitdir: <path>``) if needed.
+
+    :param repo_dir: path to repository directory
+    :type repo_dir: Path obj
+    :return git_dir: path to git directory or None if not found
+    :rtype: Path obj or None
+    """
+    dot_git = Path(repo_dir) / '.git'
+    if dot_git.is_dir():
+        git_dir = dot_git
+    elif dot_git.is_file():
+        try:
+            data = dot_git.read_text(encoding='utf-8').strip()
+        except OSError:
+            return None
+        if not data.startswith('gitdir: '):
+            return None
+        git_dir = Path(data[8:])
+        if not git_dir.is_absolute():
+            git_dir = dot_git.parent / git_dir
+    else:
+        return None
+    # reftable repositories do not use loose/packed refs
+    common_dir = get_common_dir(git_dir)
+    if (common_dir / 'reftable').exists():
+        logging.debug('Cannot read reftable refs in %s', str(common_dir))
+        return None
+    return git_dir
+
+
+def get_common_dir(git_dir):
+    """
+    Get the common git directory (shared refs and objects) for a worktree
+    git directory; this is the git directory itself for normal clones.
+
+    :param git_dir: path to git directory
+    :type git_dir: Path obj
+    :return common_dir: path to common git directory
+    :rtype: Path obj
+    """
+    try:
+        common = (git_dir / 'commondir').read_text(encoding='utf-8').strip()
+    except OSError:
+        return git_dir
+    common_dir = Path(common)
+    if not common_dir.is_absolute():
+        common_dir = git_dir / common_dir
+    return common_dir
+
+
+def read_packed_refs(git_dir):
+    """
+    Read the ``packed-refs`` file, including peeled tag values.
+
+    :param git_dir: path to (common) git directory
+    :type git_dir: Path obj
+    :return packed: dict of ref name: [hash, peeled hash or None]
+    :rtype: dict
+    """
+    packed = {}
+    try:
+        data = (git_dir / 'packed-refs').read_text(encoding='utf-8')
+    except OSError:
+        return packed
+    last_ref = None
+    for line in data.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('^'):
+            if last_ref is not None:
+                packed[last_ref][1] = line[1:]
+            continue
+        ref_hash, _, ref_name = line.partition(' ')
+        packed[ref_name] = [ref_hash, None]
+        last_ref = ref_name
+    return packed
+
+
+def resolve_ref(git_dir, ref_name, depth=5):
+    """
+    Resolve a ref name (eg, ``HEAD`` or ``refs/tags/1.0``) to an object
+    name, following symbolic refs.
+
+    :param git_dir: path to git directory
+    :type git_dir: Path obj
+    :param ref_name: full ref name
+    :type ref_name: str
+    :param depth: max number of symbolic refs to follow
+    :type depth: int
+    :return ref_hash: object name or None if not found
+    :rtype: str or None
+    """
+    if depth < 0:
+        return None
+    common_dir = get_common_dir(git_dir)
+    # per-worktree refs live in the worktree git dir
+    ref_dir = git_dir if ref_name == 'HEAD' else common_dir
+    try:
+        data = (ref_dir / ref_name).read_text(encoding='utf-8').strip()
+    except OSError:
+        data = None
+    if data is None:
+        entry = read_packed_refs(common_dir).get(ref_name)
+        return entry[0] if entry else None
+    if data.startswith('ref: '):
+        return resolve_ref(git_dir, data[5:], depth - 1)
+    return data if _is_sha(data) else None
+
+
+def read_head(git_dir):
+    """
+    Read ``HEAD`` and return the current branch name (if any) and commit.
+
+    :param git_dir: path to git directory
+    :type git_dir: Path obj
+    :return branch, head: branch name (None if detached), head hash
+    :rtype: tuple
+    """
+    try:
+        data = (git_dir / 'HEAD').read_text(encoding='utf-8').strip()
+    except OSError:
+        return None, None
+    if data.startswith('ref: '):
+        ref_name = data[5:]
+        branch = ref_name[11:] if ref_name.startswith('refs/heads/') else ref_name
+        return branch, resolve_ref(git_dir, ref_name)
+    return None, data if _is_sha(data) else None
+
+
+def list_refs(git_dir, prefix='refs/tags/'):
+    """
+    List all refs under the given prefix, from both loose refs and
+    ``packed-refs`` (loose refs win).
+
+    :param git_dir: path to git directory
+    :type git_dir: Path obj
+    :param prefix: ref name prefix
+    :type prefix: str
+    :return refs: dict of ref name: [hash, peeled hash or None]
+    :rtype: dict
+    """
+    common_dir = get_common_dir(git_dir)
+    refs = {k: v for k, v in read_packed_refs(common_dir).items() if k.startswith(prefix)}
+    loose_dir = common_dir / prefix
+    if loose_dir.is_dir():
+        for path in loose_dir.rglob('*'):
+            if not path.is_file():
+                continue
+            ref_name = path.relative_to(common_dir).as_posix()
+            try:
+                data = path.read_text(encoding='utf-8').strip()
+            except OSError:
+                continue
+            if _is_sha(data):
+                refs[ref_name] = [data, None]
+    return refs
+
+
+def read_loose_object(git_dir, obj_hash):
+    """
+    Read a loose object and return its type and content.
+
+    :param git_dir: path to git directory
+    :type git_dir: Path obj
+    :param obj_hash: object name
+    :type obj_hash: str
+    :return obj_type, content: type string and bytes, or (None, None)
+    :rtype: tuple
+    """
+    obj_path = get_common_dir(git_dir) / 'objects' / obj_hash[:2] / obj_hash[2:]
+    try:
+        data = zlib.decompress(obj_path.read_bytes())
+    except (OSError, zlib.error):
+        return None, None
+    header, _, content = data.partition(b'\0')
+    return header.split(b' ')[0].decode(), content
+
+
+def peel_ref(git_dir, ref_hash, peeled=None):
+    """
+    Peel a (tag) ref value to the object it points at. Uses the peeled
+    value from ``packed-refs`` if available, else reads loose tag objects.
+
+    :param git_dir: path to git directory
+    :type git_dir: Path obj
+    :param ref_hash: object name the ref points at
+    :type ref_hash: str
+    :param peeled: peeled value from ``packed-refs``
+    :type peeled: str or None
+    :return target: peeled object name or None if the object is packed
+    :rtype: str or None
+    """
+    if peeled:
+        return peeled
+    obj_hash = ref_hash
+    for _ in range(5):
+        obj_type, content = read_loose_object(git_dir, obj_hash)
+        if obj_type is None:
+            return None
+        if obj_type != 'tag':
+            return obj_hash
+        first_line = content.split(b'\n', 1)[0].decode()
+        if not first_line.startswith('object '):
+            return None
+        obj_hash = first_line[7:]
+    return None
+
+
+def tags_at_commit(git_dir, commit_hash):
+    """
+    Get the tag names pointing at a commit (like ``git tag --points-at``).
+
+    :param git_dir: path to git directory
+    :type git_dir: Path obj
+    :param commit_hash: commit object name
+    :type commit_hash: str
+    :return tag_names: sorted list of tag names, or None if any tag could
+                       not be peeled without git
+    :rtype: list or None
+    """
+    common_dir = get_common_dir(git_dir)
+    packed = read_packed_refs(common_dir)
+    fully_peeled = _is_fully_peeled(common_dir)
+    tag_names = []
+    for ref_name, (ref_hash, peeled) in list_refs(git_dir).items():
+        if ref_hash == commit_hash:
+            tag_names.append(ref_name[10:])
+            continue
+        if peeled is not None:
+            target = peeled
+        elif fully_peeled and packed.get(ref_name) == [ref_hash, None]:
+            continue  # packed and not an annotated tag
+        else:
+            target = peel_ref(git_dir, ref_hash)
+            if target is None:
+                return None
+        if target == commit_hash:
+            tag_names.append(ref_name[10:])
+    return sorted(tag_names)
+
+
+def _is_fully_peeled(common_dir):
+    """
+    Return ``True`` if ``packed-refs`` is fully peeled, ie, a missing peeled
+    value means the packed ref is not an annotated tag.
+    """
+    try:
+        with (common_dir / 'packed-refs').open(encoding='utf-8') as packed:
+            header = packed.readline()
+    except OSError:
+        return False
+    return header.startswith('#') and 'fully-peeled' in header.split()
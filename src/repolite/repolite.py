@@ -10,30 +10,51 @@ Manage a small set of repository dependencies without manifest.xml or git
 submodules. You get to write (local) project config files in yaml instead.
 """
 
-import argparse
+import atexit
+import hashlib
+import json
 import logging
 import os
+import re
 import subprocess as sp
 import sys
+import threading
+import time
 from pathlib import Path
 from shlex import split
-from shutil import which
-
-from munch import Munch
-
-if sys.version_info < (3, 8):
-    from importlib_metadata import version
-else:
-    from importlib.metadata import version
-
-if sys.version_info < (3, 10):
-    import importlib_resources
-else:
-    import importlib.resources as importlib_resources
-
+from shutil import rmtree, which
+
+from .gitrefs import (
+    find_git_dir,
+    get_common_dir,
+    read_head,
+    resolve_ref,
+    tags_at_commit,
+)
+from .results import (
+    OUTPUT_FORMATS,
+    emit_result,
+    is_streaming,
+    set_output_format,
+)
+from .spec import (
+    RepoSpec,
+    RepoSpecError,
+    build_config,
+    enabled_repos,
+    select_repos,
+)
+from .tracing import run_traced, start_trace, stop_trace, trace_repo
 
 # from logging_tree import printout  # debug logger environment
 
+STATE_FILE = '.repolite-state.json'
+WHEEL_CACHE = '.repolite-wheels'
+WATCH_LOCK = '.repolite-watch.lock'
+CFG_CACHE_SUFFIX = '.cache.json'
+REMOTE_TIMEOUT = 30  # seconds, only used for remote reachability checks
+CLONE_FILTER_RE = re.compile(r'^(blob:none|tree:\d+|blob:limit=\d+[kmg]?)$')
+
 
 class DirectoryTypeError(Exception):
     """Raise when there is a directory mismatch between cfg and actual"""
@@ -47,6 +68,12 @@ class FileTypeError(Exception):
     __module__ = Exception.__module__
 
 
+class RepoProcessError(Exception):
+    """Raise when one or more repositories could not be processed"""
+
+    __module__ = Exception.__module__
+
+
 def check_for_git():
     """
     Make sure we can find the ``git`` and ``git-lfs`` binaries in the
@@ -80,11 +107,65 @@ def check_repo_url(url):
     return url
 
 
+def resolve_repo_url(url, top_dir):
+    """
+    Resolve a relative local repository path against ``top_dir`` (where
+    ``git clone`` runs), so it also works as a stored remote url or from
+    another directory. Urls, absolute paths, and paths that do not exist
+    are returned as-is.
+
+    :param url: url / path from ``check_repo_url``
+    :type url: str
+    :param top_dir: top-level repository directory (need not exist)
+    :type top_dir: Path obj
+    :return url: absolute path or input url
+    :rtype: str
+    """
+    if Path(url).is_absolute():
+        return url
+    url_path = top_dir.joinpath(url).resolve()
+    return str(url_path) if url_path.exists() else url
+
+
+def check_repo_current(item, top_dir, ulock=False):
+    """
+    Check if a repository is already up-to-date, ie, the configured branch
+    is checked out and HEAD matches the remote branch tip (or the locked
+    hash if using a locked config). The remote tip is probed with
+    ``git ls-remote`` so nothing is fetched.
+
+    :param item: repository obj (from yaml cfg)
+    :type item: Munch obj
+    :param top_dir: top-level repository directory
+    :type top_dir: Path obj
+    :param ulock: compare against ``repo_hash`` instead of the remote
+    :type ulock: Boolean
+    :return is_current: Boolean
+    """
+    git_dir = item.repo_alias if item.repo_alias else item.repo_name
+    repo_dir = top_dir / str(git_dir)
+    try:
+        head, branch = get_repo_head(repo_dir)
+        if ulock:
+            return bool(item.repo_hash) and head == item.repo_hash
+        if branch != item.repo_branch:
+            return False
+        remote_tip = get_remote_ref(
+            item.repo_remote, f'refs/heads/{item.repo_branch}', repo_dir
+        )
+    except (sp.CalledProcessError, OSError) as exc:
+        logging.debug('Cannot probe repository %s: %s', str(git_dir), exc)
+        return False
+    logging.debug('Repository %s remote tip is %s', str(git_dir), remote_tip)
+    return remote_tip is not None and head == remote_tip
+
+
 def check_repo_state(ucfg):
     """
     Check if repo configuration is consistent, ie, does current repo state
     match repo configuration items.  Return ``True`` if current directories
-    match the configuration, else ``False``.
+    match the configuration, else ``False``. If only some repos are selected
+    (see ``select_repos``) the selected repos only need to exist.
 
     :param ucfg: Munch configuration object extracted from config file
     :type ucfg: Munch cfgobj
@@ -98,27 +179,156 @@ def check_repo_state(ucfg):
         logging.exception("Could not change to repo directory: %s", exc)
         sys.exit(1)
 
-    sorted_dir_list = sorted([x for x in top_dir.iterdir() if x.is_dir()])
+    # the state file must exist before checking the top_dir stamp
+    state = load_repo_state(top_dir)
+    if not top_dir.joinpath(STATE_FILE).exists():
+        save_repo_state(top_dir, state)
+    dir_stamp = top_dir.stat().st_mtime_ns
+    if state.get('dir_stamp') == dir_stamp:
+        sorted_name_list = state['dirs']
+    else:
+        sorted_name_list = list_repo_dirs(top_dir)
+        state['dir_stamp'] = dir_stamp
+        state['dirs'] = sorted_name_list
+        save_repo_state(top_dir, state)
+
+    return compare_repo_dirs(ucfg, sorted_name_list)
+
+
+def compare_repo_dirs(ucfg, dir_list):
+    """
+    Compare the enabled repos with the existing directories in ``top_dir``.
+    If only some repos are selected, the selected repos only need to exist.
+
+    :param ucfg: Munch configuration object extracted from config file
+    :type ucfg: Munch cfgobj
+    :param dir_list: sorted list of directory names
+    :type dir_list: list
+    :return is_state_valid: Boolean
+    """
     repo_name_list = []
-    sorted_name_list = []
-    for item in sorted_dir_list:
-        sorted_name_list.append(item.stem)
-    for item in [x for x in ucfg.repos if x.repo_enable]:
+    for item in enabled_repos(ucfg.repos):
         dir_name = item.repo_alias if item.repo_alias else item.repo_name
         repo_name_list.append(dir_name)
-    is_state_valid = sorted(repo_name_list) == sorted_name_list
+    if any(not getattr(x, 'selected', True) for x in ucfg.repos if x.repo_enable):
+        # with selectors, only the selected repos need to exist
+        is_state_valid = set(repo_name_list).issubset(dir_list)
+    else:
+        is_state_valid = sorted(repo_name_list) == dir_list
     if not is_state_valid:
-        logging.warning(
-            'Invalid state: %s not equal to %s', repo_name_list, sorted_name_list
-        )
+        logging.warning('Invalid state: %s not equal to %s', repo_name_list, dir_list)
     return is_state_valid
 
 
-def generate_change_data(mrepo, base_tag, dir_name, cur_tag):
+def fetch_repo_hash(item, repo_dir, quiet, filter_spec=None, output=None):
+    """
+    Fetch exactly the pinned ``repo_hash`` commit for a locked config, unless
+    the commit is already present. New (empty) or shallow repositories fetch
+    at depth 1, otherwise only the missing objects are fetched. Falls back
+    to fetching all refs if the server does not allow fetching by hash.
+
+    :param item: repository obj (from yaml cfg)
+    :type item: Munch obj
+    :param repo_dir: path to repository directory
+    :type repo_dir: Path obj
+    :param quiet: Suppress some git output
+    :type quiet: Boolean
+    :param filter_spec: optional partial clone filter
+    :type filter_spec: str or None
+    :param output: optional buffer for captured command output
+    :type output: list or None
+    :raises CalledProcessError: if the fetch fails
+    """
+    git_has_commit = f'git cat-file -e {item.repo_hash}^{{commit}}'
+    proc = run_traced(
+        sp.run, split(git_has_commit), cwd=repo_dir, capture_output=True, check=False
+    )
+    if proc.returncode == 0:
+        logging.debug('Commit %s already present', item.repo_hash)
+        return
+
+    git_dir = find_git_dir(repo_dir)
+    head, _ = get_repo_head(repo_dir)
+    is_shallow = git_dir is not None and git_dir.joinpath('shallow').exists()
+    fetch_opts = '-q ' if quiet else ''
+    if filter_spec:
+        fetch_opts += f'--filter={filter_spec} '
+    depth_opt = '--depth 1 ' if head is None or is_shallow else ''
+    git_fetch_hash = (
+        f'git fetch {fetch_opts}{depth_opt}{item.repo_remote} {item.repo_hash}'
+    )
+    try:
+        run_cmd(git_fetch_hash, repo_dir, output)
+    except sp.CalledProcessError:
+        logging.warning('Cannot fetch %s by hash, fetching all refs', item.repo_hash)
+        if is_shallow:
+            fetch_opts += '--unshallow '
+        run_cmd(f'git fetch {fetch_opts}--tags {item.repo_remote}', repo_dir, output)
+
+
+def find_first_section(lines, ext):
+    """
+    Find the first (version) section heading in changelog text, ie, an rst
+    heading underlined with ``-`` or a markdown ``##`` heading.
+
+    :param lines: changelog text lines
+    :type lines: list
+    :param ext: changelog file extension (rst or md)
+    :type ext: str
+    :return idx: index of the heading line or None if not found
+    :rtype: int or None
+    """
+    for idx, line in enumerate(lines):
+        if ext == 'md':
+            if line.startswith('## '):
+                return idx
+            continue
+        title = line.strip()
+        underline = lines[idx + 1].strip() if idx + 1 < len(lines) else ''
+        if (
+            title
+            and underline
+            and set(underline) == {'-'}
+            and len(underline) >= len(title)
+        ):
+            return idx
+    return None
+
+
+def finish_trace(trace_file, count=10):
+    """
+    Stop tracing, write the trace file, and log the slowest commands.
+
+    :param trace_file: output file for Chrome trace-event data
+    :type trace_file: Path or str
+    :param count: number of slowest commands to log
+    :type count: int
+    """
+    tracer = stop_trace()
+    if tracer is None:
+        return
+    tracer.write(trace_file)
+    total = len(tracer.events)
+    logging.info('Slowest %d of %d commands:', min(count, total), total)
+    for event in tracer.slowest(count):
+        logging.info(
+            '%8.3f s  %-20s %s%s',
+            event['duration'],
+            event['repo'],
+            event['step'],
+            f" (exit {event['status']})" if event['status'] else '',
+        )
+
+
+def generate_change_data(
+    mrepo, base_tag, dir_name, cur_tag, repo_dir=None, prev_tag=None
+):
     """
     Generate a changelog (full or diff) for the given repository and drop
     it in the configured top_dir directory. Checks repo config for base
-    tag to decide full vs diff.
+    tag to decide full vs diff. If ``prev_tag`` is given, only the new
+    commits (``prev_tag..cur_tag``) are generated and merged into the
+    existing changelog file.
 
     :param mrepo: a Munch repo obj with Munch repos item
     :type mrepo: Munch obj
@@ -128,50 +338,545 @@ def generate_change_data(mrepo, base_tag, dir_name, cur_tag):
     :type dir_name: str
     :param cur_tag: ending tag for change diff (tag on current commit)
     :type cur_tag: str
+    :param repo_dir: repository directory (default is current directory)
+    :type repo_dir: Path obj or None
+    :param prev_tag: tag on the commit of the existing changelog file
+    :type prev_tag: str or None
+    :return status: ``updated`` if merged, else ``generated``
+    :rtype: str
     """
     base_cmd_str = 'gitchangelog'
     output_file = f'{dir_name}/{mrepo.name}-CHANGELOG.{mrepo.item.repo_changelog_ext}'
 
+    if prev_tag:
+        cmd_str = base_cmd_str + f' {prev_tag}..{cur_tag}'
+        logging.debug('Running gitchangelog cmd: %s', cmd_str)
+        new_data = run_traced(sp.check_output, split(cmd_str), cwd=repo_dir).decode(
+            'utf-8'
+        )
+        old_data = Path(output_file).read_text(encoding='utf-8')
+        chg_data = merge_change_data(old_data, new_data, mrepo.item.repo_changelog_ext)
+        if chg_data is not None:
+            Path(output_file).write_text(chg_data, encoding='utf-8')
+            logging.info('ChangeLog file (updated): %s', Path(output_file))
+            return 'updated'
+        logging.debug('Cannot merge new changes into %s', output_file)
+
     if base_tag:
         base_cmd_str = base_cmd_str + f' {base_tag}..{cur_tag}'
 
     logging.debug('Running gitchangelog cmd: %s', base_cmd_str)
-    chg_data = sp.check_output(split(base_cmd_str))
+    chg_data = run_traced(sp.check_output, split(base_cmd_str), cwd=repo_dir)
     Path(output_file).write_bytes(chg_data)
     logging.info('ChangeLog file: %s', Path(output_file))
+    return 'generated'
+
+
+def get_clone_filter(item):
+    """
+    Get the partial clone filter spec (if any) from the ``repo_opts`` list,
+    eg, ``filter=blob:none``. Supported filters are ``blob:none``,
+    ``tree:<depth>`` and ``blob:limit=<n>[kmg]``.
+
+    :param item: repository obj (from yaml cfg)
+    :type item: Munch obj
+    :return filter_spec: filter spec string or None
+    :rtype: str or None
+    :raises ValueError: if the filter spec or option is not supported
+    """
+    filter_spec = None
+    for opt in item.repo_opts or []:
+        key, _, value = str(opt).lstrip('-').partition('=')
+        if key != 'filter':
+            raise ValueError(f'{item.repo_name}: unknown repo_opts item: {opt}')
+        if not CLONE_FILTER_RE.match(value):
+            raise ValueError(f'{item.repo_name}: unsupported clone filter: {value}')
+        filter_spec = value
+    return filter_spec
+
+
+def get_remote_ref(remote, ref, cwd=None):
+    """
+    Get the commit hash for a single ref from a remote (name or url) using
+    ``git ls-remote``, ie, without fetching anything.
+
+    :param remote: remote name or url
+    :type remote: str
+    :param ref: full ref name, eg, ``refs/heads/main``
+    :type ref: str
+    :param cwd: repository directory (needed for remote names)
+    :type cwd: Path or str or None
+    :return commit_hash: hash string or None if the ref was not found
+    :rtype: str or None
+    """
+    git_ls_remote = f'git ls-remote {remote} {ref}'
+    logging.debug('Ls-remote cmd: %s', git_ls_remote)
+    ref_data = run_traced(sp.check_output, split(git_ls_remote), cwd=cwd, text=True)
+    for line in ref_data.splitlines():
+        commit_hash, _, ref_name = line.partition('\t')
+        if ref_name == ref:
+            return commit_hash
+    return None
+
+
+def get_head_tags(repo_dir):
+    """
+    Get the tags pointing at HEAD (like ``git tag --points-at``) using the
+    in-process ref reader, falling back to git if needed.
+
+    :param repo_dir: path to repository directory
+    :type repo_dir: Path obj
+    :return tag_names: list of tag names
+    :rtype: list
+    """
+    git_dir = find_git_dir(repo_dir)
+    if git_dir is not None:
+        _, head = read_head(git_dir)
+        tag_names = tags_at_commit(git_dir, head) if head else None
+        if tag_names is not None:
+            return tag_names
+    git_check_tag = 'git tag --points-at'
+    return run_traced(
+        sp.check_output, split(git_check_tag), cwd=repo_dir, text=True
+    ).splitlines()
+
+
+def get_object_counts(repo_dir):
+    """
+    Get the object and pack counts of a repository from
+    ``git count-objects -v``, ie, ``count`` and ``size`` (KiB) for loose
+    objects, ``in-pack``, ``packs``, and ``size-pack`` (KiB) for packs.
+
+    :param repo_dir: path to repository directory
+    :type repo_dir: Path obj
+    :return counts: dict of count values
+    :rtype: dict
+    """
+    data = run_traced(
+        sp.check_output, ['git', 'count-objects', '-v'], cwd=repo_dir, text=True
+    )
+    counts = {}
+    for line in data.splitlines():
+        key, _, value = line.partition(':')
+        if value.strip().isdigit():
+            counts[key.strip()] = int(value)
+    return counts
+
+
+def get_ref_hash(repo_dir, ref_name):
+    """
+    Resolve a full ref name to a hash using the in-process ref reader,
+    falling back to ``git rev-parse`` if needed.
+
+    :param repo_dir: path to repository directory
+    :type repo_dir: Path obj
+    :param ref_name: full ref name, eg, ``refs/tags/1.0``
+    :type ref_name: str
+    :return ref_hash: hash string or None if the ref does not exist
+    :rtype: str or None
+    """
+    git_dir = find_git_dir(repo_dir)
+    if git_dir is not None:
+        return resolve_ref(git_dir, ref_name)
+    git_rev_parse = f'git rev-parse -q --verify {ref_name}'
+    proc = run_traced(
+        sp.run,
+        split(git_rev_parse),
+        cwd=repo_dir,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    return proc.stdout.strip() or None
+
+
+def get_ref_stamp(repo_dir):
+    """
+    Get a cheap validity stamp for cached repository state, ie, the mtimes
+    of ``.git/HEAD``, the current branch ref, and ``packed-refs``.
+
+    :param repo_dir: path to repository directory
+    :type repo_dir: Path obj
+    :return stamp: list of mtime values or None if not available
+    :rtype: list or None
+    """
+    git_path = find_git_dir(repo_dir)
+    if git_path is None:
+        return None
+    head_file = git_path / 'HEAD'
+    try:
+        head_data = head_file.read_text(encoding='utf-8').strip()
+        stamp = [head_file.stat().st_mtime_ns]
+    except OSError:
+        return None
+    common_dir = get_common_dir(git_path)
+    ref_paths = [common_dir / 'packed-refs']
+    if head_data.startswith('ref: '):
+        ref_paths.append(common_dir / head_data[5:])
+    for path in ref_paths:
+        try:
+            stamp.append(path.stat().st_mtime_ns)
+        except OSError:
+            stamp.append(0)
+    return stamp
+
+
+def get_repo_state(top_dir, dir_names, jobs=None):
+    """
+    Get the cached state for each repository directory from the state file
+    in ``top_dir``. Entries that are missing or stale (see ``get_ref_stamp``)
+    are refreshed from git and the state file is updated. If a watcher is
+    active (see ``watch_repo_state``) the entries are usually fresh already.
+
+    :param top_dir: top-level repository directory
+    :type top_dir: Path obj
+    :param dir_names: repository directory names
+    :type dir_names: list
+    :param jobs: number of repositories to refresh in parallel
+    :type jobs: int or None
+    :return repo_state: dict of state entries keyed by directory name
+    :rtype: dict
+    """
+    state = load_repo_state(top_dir)
+    repos = state['repos']
+    stale = []
+    for name in dir_names:
+        stamp = get_ref_stamp(top_dir / name)
+        if stamp is None or repos.get(name, {}).get('stamp') != stamp:
+            stale.append(name)
+    if stale:
+        logging.debug('Refreshing repo state: %s', stale)
+        fresh = map_repos(lambda x: read_repo_state(top_dir / x), stale, jobs)
+        for name, entry in zip(stale, fresh):
+            repos[name] = {**repos.get(name, {}), **entry}
+        save_repo_state(top_dir, state)
+    return {x: repos[x] for x in dir_names}
+
+
+def get_repo_head(repo_dir):
+    """
+    Get the HEAD commit and current branch of a repository using the
+    in-process ref reader, falling back to ``git rev-parse`` if needed.
+
+    :param repo_dir: path to repository directory
+    :type repo_dir: Path obj
+    :return head, branch: commit hash and branch name ('HEAD' if detached),
+                          or (None, None) if HEAD cannot be resolved
+    :rtype: tuple
+    """
+    git_dir = find_git_dir(repo_dir)
+    if git_dir is not None:
+        branch, head = read_head(git_dir)
+        if head is not None:
+            return head, branch if branch else 'HEAD'
+    git_rev_parse = 'git rev-parse HEAD --abbrev-ref HEAD'
+    proc = run_traced(
+        sp.run,
+        split(git_rev_parse),
+        cwd=repo_dir,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode:
+        return None, None
+    head, branch = proc.stdout.split()
+    return head, branch
+
+
+def get_repo_status(repo_dir):
+    """
+    Collect the current state of a repository from a single porcelain
+    status call, ie, branch, HEAD commit, dirty flag and ahead/behind
+    counts (when the branch has an upstream). The describe string is
+    still from git describe, with the dirty flag taken from the status.
+
+    :param repo_dir: path to repository directory
+    :type repo_dir: Path obj
+    :return status: repository status
+    :rtype: Munch obj
+    """
+    from munch import Munch
+
+    status = Munch(
+        name=repo_dir.name,
+        branch=None,
+        head=None,
+        upstream=None,
+        ahead=0,
+        behind=0,
+        dirty=False,
+        describe=None,
+    )
+    git_status = 'git status --porcelain=v2 --branch --untracked-files=no'
+    git_describe = 'git describe --tags --always'
+
+    status_data = run_traced(sp.check_output, split(git_status), cwd=repo_dir, text=True)
+    for line in status_data.splitlines():
+        if not line.startswith('# '):
+            status.dirty = True
+            continue
+        key, _, value = line[2:].partition(' ')
+        if key == 'branch.oid':
+            status.head = None if value == '(initial)' else value
+        elif key == 'branch.head':
+            status.branch = 'HEAD' if value == '(detached)' else value
+        elif key == 'branch.upstream':
+            status.upstream = value
+        elif key == 'branch.ab':
+            ahead, behind = value.split()
+            status.ahead = int(ahead)
+            status.behind = abs(int(behind))
+
+    describe = run_traced(
+        sp.check_output, split(git_describe), cwd=repo_dir, text=True
+    ).strip()
+    status.describe = f'{describe}-dirty' if status.dirty else describe
+    return status
+
+
+def get_watched_status(top_dir, dir_names):
+    """
+    Get the status snapshot for each repository from the state file, if a
+    watcher is active and has a current snapshot (see ``get_ref_stamp``)
+    for every repository.
+
+    :param top_dir: top-level repository directory
+    :type top_dir: Path obj
+    :param dir_names: repository directory names
+    :type dir_names: list
+    :return statuses: list of status objs or None
+    :rtype: list or None
+    """
+    from munch import Munch
+
+    if not is_watch_active(top_dir):
+        return None
+    repos = load_repo_state(top_dir)['repos']
+    if not all('status' in repos.get(x, {}) for x in dir_names):
+        return None
+    # the watcher may not have caught up yet (see ``RepoWatcher.poll``)
+    if any(get_ref_stamp(top_dir / x) != repos[x].get('stamp') for x in dir_names):
+        return None
+    return [Munch(repos[x]['status']) for x in dir_names]
+
+
+def get_update_action(rebase):
+    """
+    Get the (local) command to update the checked out branch from the
+    fetched remote-tracking branch, ie, the equivalent of ``git pull`` with
+    either ``--ff-only`` or ``--rebase=merges`` without fetching again.
+
+    :param rebase: rebase local commits instead of fast-forward only
+    :type rebase: Boolean
+    :return git_action: git command string (without the upstream ref)
+    :rtype: str
+    """
+    if rebase:
+        return 'git rebase --rebase-merges --fork-point '
+    return 'git merge --ff-only '
+
+
+def get_wheel_key(repo_dir):
+    """
+    Get the wheel cache key for a repository, ie, the HEAD commit hash, or
+    None if the work tree is dirty (or HEAD cannot be resolved).
+
+    :param repo_dir: path to repository directory
+    :type repo_dir: Path obj
+    :return wheel_key: commit hash or None
+    :rtype: str or None
+    """
+    head, _ = get_repo_head(repo_dir)
+    git_status = 'git status --porcelain --untracked-files=no'
+    status_data = run_traced(sp.check_output, split(git_status), cwd=repo_dir, text=True)
+    return None if status_data.strip() else head
+
+
+def get_cached_wheel(cache_dir, pip_name, quiet=False):
+    """
+    Get the wheel file from a wheel cache directory, building it with
+    ``pip wheel`` first if the cache directory is empty.
+
+    :param cache_dir: wheel cache directory for one repository commit
+    :type cache_dir: Path obj
+    :param pip_name: path to directory name of python repo
+    :type pip_name: Path obj
+    :param quiet: filter most of the build cmd output
+    :type quiet: boolean
+    :return wheel_file: path to wheel file
+    :rtype: Path obj
+    :raises FileNotFoundError: if no wheel was built
+    """
+    wheel_files = sorted(cache_dir.glob('*.whl'))
+    if not wheel_files:
+        pip_cmd = [sys.executable, '-m', 'pip', 'wheel', '--no-deps']
+        if quiet:
+            pip_cmd.append('-q')
+        pip_cmd += ['-w', str(cache_dir), str(pip_name)]
+        logging.debug('Running wheel cmd: %s', pip_cmd)
+        run_traced(sp.check_call, pip_cmd)
+        wheel_files = sorted(cache_dir.glob('*.whl'))
+    if not wheel_files:
+        raise FileNotFoundError(f'No wheel found for {pip_name}')
+    return wheel_files[-1]
+
+
+def acquire_watch_lock(top_dir):
+    """
+    Take the watcher lock in ``top_dir``, ie, an exclusive ``flock`` on the
+    lock file (with our pid as content) that is held while the watcher
+    runs, and released by the OS when the watcher exits.
+
+    :param top_dir: top-level repository directory
+    :type top_dir: Path obj
+    :return lock_file: open lock file (close it to release the lock)
+    :rtype: file obj
+    :raises DirectoryTypeError: if another watcher holds the lock
+    """
+    import fcntl
+
+    lock_file = open(  # pylint: disable=consider-using-with
+        top_dir / WATCH_LOCK, 'a+', encoding='utf-8'
+    )
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.seek(0)
+        pid = lock_file.read().strip()
+        lock_file.close()
+        raise DirectoryTypeError(f'Already watched by pid {pid}') from None
+    lock_file.truncate(0)
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    return lock_file
+
+
+def is_watch_active(top_dir):
+    """
+    Check if the workspace state is kept current by a running watcher, ie,
+    the watcher lock in ``top_dir`` is held (see ``acquire_watch_lock``).
+
+    :param top_dir: top-level repository directory
+    :type top_dir: Path obj
+    :return is_active: Boolean
+    """
+    lock_path = Path(top_dir) / WATCH_LOCK
+    if not lock_path.exists():
+        return False
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(lock_path, 'rb') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    return False
 
 
-def install_with_pip(pip_name, quiet=False):
+def is_wheel_installed(wheel_file):
     """
-    Install a python repository via pip; this should be done in a local
+    Check if the distribution and version in the wheel filename is what is
+    currently installed.
+
+    :param wheel_file: path to wheel file
+    :type wheel_file: Path obj
+    :return is_installed: Boolean
+    """
+    if sys.version_info < (3, 8):
+        from importlib_metadata import PackageNotFoundError, version
+    else:
+        from importlib.metadata import PackageNotFoundError, version
+
+    dist_name, dist_version = wheel_file.name.split('-')[:2]
+    try:
+        return version(dist_name) == dist_version
+    except PackageNotFoundError:
+        return False
+
+
+def install_with_pip(pip_names, quiet=False, force=False):
+    """
+    Install one or more python repositories via a single pip command, so
+    all requirements are resolved together; this should be done in a local
     virtual environment.
 
-    :param pip_name: path to directory name of python repo to install
-    :type pip_name: str
+    :param pip_names: path(s) to directory name of python repo(s) to install
+    :type pip_names: str or Path or list
     :param quiet: filter most of the install cmd output
     :type quiet: boolean
+    :param force: reinstall (without deps) even if the same version is
+                  already installed
+    :type force: boolean
     """
-    pip_cmd_str = '-m pip install' + f' {pip_name}'
-    pip_cmd = [sys.executable] + pip_cmd_str.split()
+    if isinstance(pip_names, (str, Path)):
+        pip_names = [pip_names]
+    if not pip_names:
+        return
+    pip_cmd = [sys.executable, '-m', 'pip', 'install']
+    if force:
+        pip_cmd += ['--force-reinstall', '--no-deps']
+    pip_cmd += [str(x) for x in pip_names]
     logging.debug('Running install cmd: %s', pip_cmd)
     runner = sp.check_output
     if not quiet:
         runner = sp.check_call
-    runner(pip_cmd)
+    run_traced(runner, pip_cmd)
     if not quiet:
-        pkg_reqs = sp.check_output([sys.executable, '-m', 'pip', 'freeze'])
+        pkg_reqs = run_traced(sp.check_output, [sys.executable, '-m', 'pip', 'freeze'])
         pkg_deps = [r.decode().split('@')[0] for r in pkg_reqs.split()]
-        logging.info('Installed %s dependencies: %s', pip_name, pkg_deps)
+        logging.info(
+            'Installed %s dependencies: %s', [str(x) for x in pip_names], pkg_deps
+        )
 
 
-def load_config(file_encoding='utf-8'):
+def is_ancestor(repo_dir, ancestor, commit):
     """
-    Load yaml configuration file and munchify the data. If ENV path or local
-    file is not found in current directory, the default will be loaded.
+    Check if ``ancestor`` is an ancestor of (or the same as) ``commit``.
+
+    :param repo_dir: path to repository directory
+    :type repo_dir: Path obj
+    :param ancestor: commit object name
+    :type ancestor: str
+    :param commit: commit object name
+    :type commit: str
+    :return: True if ancestor, else False
+    :rtype: bool
+    """
+    cmd = ['git', 'merge-base', '--is-ancestor', ancestor, commit]
+    return (
+        run_traced(
+            sp.run, cmd, cwd=repo_dir, stdout=sp.DEVNULL, stderr=sp.DEVNULL
+        ).returncode
+        == 0
+    )
 
-    :param file_encoding: file encoding of config file
-    :type file_encoding: str
-    :return tuple: Munch cfg obj and cfg file as Path obj
+
+def list_repo_dirs(top_dir):
+    """
+    List the (repository) directory names in ``top_dir``, ignoring our own
+    cache directories.
+
+    :param top_dir: top-level repository directory
+    :type top_dir: Path obj
+    :return dir_names: sorted list of directory names
+    :rtype: list
+    """
+    path_list = sorted([x for x in top_dir.iterdir() if x.is_dir()])
+    return [x.stem for x in path_list if not x.name.startswith('.repolite')]
+
+
+def get_config_file():
+    """
+    Get the active config file path (without loading it), ie, the ENV path,
+    the local file in the current directory, or the packaged default.
+
+    :return cfgfile: config file path
+    :rtype: Path obj (or Traversable for the packaged default)
     :raises FileTypeError: if the input file is not yml
     """
     repo_cfg = os.getenv('REPO_CFG', default='')
@@ -180,13 +885,312 @@ def load_config(file_encoding='utf-8'):
     if not cfgfile.name.lower().endswith(('.yml', '.yaml')):
         raise FileTypeError(f"FileTypeError: unknown file extension: {cfgfile.name}")
     if not cfgfile.exists():
+        if sys.version_info < (3, 10):
+            import importlib_resources
+        else:
+            import importlib.resources as importlib_resources
+
         cfgfile = importlib_resources.files('repolite.data').joinpath('example.yml')
+    return cfgfile
+
+
+def load_config(file_encoding='utf-8'):
+    """
+    Load yaml configuration file, validate it, and munchify the data (with
+    a ``RepoSpec`` for each repository). If ENV path or local file is not
+    found in current directory, the default will be loaded.
+
+    :param file_encoding: file encoding of config file
+    :type file_encoding: str
+    :return tuple: Munch cfg obj and cfg file as Path obj
+    :raises FileTypeError: if the input file is not yml
+    :raises RepoSpecError: if the config data is not valid
+    """
+    from munch import Munch
+
+    cfgfile = get_config_file()
     logging.debug('Using config: %s', str(cfgfile.resolve()))
-    cfgobj = Munch.fromYAML(cfgfile.read_text(encoding=file_encoding))
+    cfg_bytes = cfgfile.read_bytes()
+    cache_file = None
+    # the packaged default config is never cached
+    if isinstance(cfgfile, Path) and cfgfile.parent != Path(__file__).parent / 'data':
+        cache_name = f'.{cfgfile.name.lstrip(".")}{CFG_CACHE_SUFFIX}'
+        cache_file = cfgfile.with_name(cache_name)
+        cache_key = get_config_key(cfgfile, cfg_bytes)
+        cfg_data = read_config_cache(cache_file, cache_key)
+        if cfg_data is not None:
+            logging.debug('Using cached config: %s', str(cache_file))
+            return Munch(build_config(cfg_data)), cfgfile
+
+    cfg_data = load_yaml(cfg_bytes.decode(file_encoding))
+    cfgobj = Munch(build_config(cfg_data))
+    if cache_file is not None:
+        write_config_cache(cache_file, cache_key, cfg_data)
 
     return cfgobj, cfgfile
 
 
+def load_yaml(text):
+    """
+    Parse YAML text with the libyaml-backed safe loader if available, else
+    the pure-Python safe loader.
+
+    :param text: YAML document
+    :type text: str
+    :return data: parsed data
+    """
+    import yaml
+
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    return yaml.load(text, Loader=loader)  # nosec B506 - safe loader
+
+
+def get_config_key(cfgfile, cfg_bytes):
+    """
+    Get the cache key for a config file, ie, path, size, mtime, and content
+    hash.
+
+    :param cfgfile: config file path
+    :type cfgfile: Path obj
+    :param cfg_bytes: config file content
+    :type cfg_bytes: bytes
+    :return key: cache key
+    :rtype: dict
+    """
+    stat = cfgfile.stat()
+    return {
+        'path': str(cfgfile.resolve()),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime_ns,
+        'sha256': hashlib.sha256(cfg_bytes).hexdigest(),
+    }
+
+
+def run_daemon_query(opts):
+    """
+    Run a show, has-tag, state-check, or lock query via the daemon, if one
+    is running for the active config file (see ``daemon.RepoDaemon``).
+
+    :param opts: parsed cmd line options
+    :type opts: Namespace
+    :return exit_code: exit code, or None if the query must be run locally
+    :rtype: int or None
+    """
+    if opts.show:
+        request = {'cmd': 'show'}
+    elif opts.has_tag:
+        request = {'cmd': 'has-tag', 'tag': opts.has_tag}
+    elif opts.check_state:
+        request = {'cmd': 'check'}
+    elif opts.lock:
+        request = {'cmd': 'lock'}
+    else:
+        return None
+    cfgfile = get_config_file()
+    if not isinstance(cfgfile, Path):
+        return None
+
+    from .daemon import daemon_request, get_socket_path
+
+    request.update(
+        config=str(cfgfile.resolve()),
+        cwd=str(Path.cwd().resolve()),
+        only=opts.only_names,
+        groups=opts.groups,
+        match=opts.pattern,
+    )
+    response = daemon_request(get_socket_path(cfgfile), request)
+    if response is None:
+        return None
+    if not response.get('ok'):
+        logging.debug('Daemon cannot run query: %s', response.get('error'))
+        return None
+    logging.debug('Query answered by daemon')
+
+    cmd = request['cmd']
+    if cmd == 'show':
+        for status in response['repos']:
+            emit_result('show', status['name'], **status)
+        log_repo_status(response['repos'])
+        return 0
+    if cmd == 'check':
+        emit_result('check', response['top_dir'], valid=response['valid'])
+        return 0 if response['valid'] else 1
+    if cmd == 'has-tag':
+        for name, exists in response['repos'].items():
+            emit_result('has-tag', name, tag=opts.has_tag, exists=exists)
+        return 0 if all(response['repos'].values()) else 1
+    for name, data in response['repos'].items():
+        emit_result('lock', name, **data)
+    logging.info('Locked config: %s-locked%s', cfgfile.stem, cfgfile.suffix)
+    return 0
+
+
+def read_config_cache(cache_file, cache_key):
+    """
+    Read the compiled config data from a cache file if the cache key matches.
+
+    :param cache_file: cache file path
+    :type cache_file: Path obj
+    :param cache_key: current config cache key
+    :type cache_key: dict
+    :return cfg_data: cached config data or None
+    :rtype: dict or None
+    """
+    try:
+        cache = json.loads(cache_file.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cache, dict) or cache.get('key') != cache_key:
+        return None
+    return cache.get('data')
+
+
+def write_config_cache(cache_file, cache_key, cfg_data):
+    """
+    Write the compiled config data to a cache file (failures are ignored).
+
+    :param cache_file: cache file path
+    :type cache_file: Path obj
+    :param cache_key: config cache key
+    :type cache_key: dict
+    :param cfg_data: parsed config data
+    :type cfg_data: dict
+    """
+    try:
+        data = json.dumps({'key': cache_key, 'data': cfg_data})
+        cache_file.write_text(data, encoding='utf-8')
+    except (OSError, TypeError, ValueError) as exc:
+        logging.debug('Cannot write config cache: %s', exc)
+
+
+def load_repo_state(top_dir):
+    """
+    Load the workspace state file from ``top_dir``. A missing or unreadable
+    file results in an empty state.
+
+    :param top_dir: top-level repository directory
+    :type top_dir: Path obj
+    :return state: workspace state data
+    :rtype: dict
+    """
+    try:
+        state = json.loads(top_dir.joinpath(STATE_FILE).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        state = {}
+    if not isinstance(state, dict) or state.get('version') != 1:
+        state = {'version': 1, 'repos': {}}
+    return state
+
+
+def map_repos(func, items, jobs=None):
+    """
+    Apply ``func`` to each item using a thread pool and return the results
+    in the same order as the input items.
+
+    :param func: callable taking a single item
+    :type func: function
+    :param items: input items, eg, repository paths
+    :type items: list
+    :param jobs: number of worker threads (None means pool default)
+    :type jobs: int or None
+    :return results: list of results
+    """
+    if jobs == 1 or len(items) < 2:
+        return [func(x) for x in items]
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(func, items))
+
+
+def merge_change_data(old_data, new_data, ext):
+    """
+    Merge changelog text for a new commit range into an existing changelog,
+    ie, insert the new sections before the first section of the existing
+    text. Return None if the sections cannot be found or the new range
+    starts with the same section as the existing text, eg, ``(unreleased)``.
+
+    :param old_data: existing changelog text
+    :type old_data: str
+    :param new_data: changelog text for the new commit range
+    :type new_data: str
+    :param ext: changelog file extension (rst or md)
+    :type ext: str
+    :return merged: merged changelog text or None
+    :rtype: str or None
+    """
+    old_lines = old_data.splitlines(keepends=True)
+    new_lines = new_data.splitlines(keepends=True)
+    old_idx = find_first_section(old_lines, ext)
+    new_idx = find_first_section(new_lines, ext)
+    if old_idx is None or new_idx is None:
+        return None
+    if old_lines[old_idx].strip() == new_lines[new_idx].strip():
+        return None
+    return ''.join(old_lines[:old_idx] + new_lines[new_idx:] + old_lines[old_idx:])
+
+
+def read_repo_state(repo_dir, remote=None, branch=None):
+    """
+    Read the current state of a repository from git, ie, HEAD and branch,
+    plus the remote-tracking branch tip if remote and branch are given.
+
+    :param repo_dir: path to repository directory
+    :type repo_dir: Path obj
+    :param remote: remote name
+    :type remote: str or None
+    :param branch: branch name
+    :type branch: str or None
+    :return entry: state entry for this repository
+    :rtype: dict
+    """
+    stamp = get_ref_stamp(repo_dir)
+    head, cur_branch = get_repo_head(repo_dir)
+    entry = {'dir': repo_dir.name, 'head': head, 'branch': cur_branch, 'stamp': stamp}
+    if remote and branch:
+        entry['remote_tip'] = get_ref_hash(repo_dir, f'refs/remotes/{remote}/{branch}')
+    return entry
+
+
+def refresh_repo_snapshot(top_dir, dir_names, jobs=None):
+    """
+    Refresh the full status snapshot (see ``get_repo_status``) for each
+    repository directory and save it in the state file.
+
+    :param top_dir: top-level repository directory
+    :type top_dir: Path obj
+    :param dir_names: repository directory names
+    :type dir_names: list
+    :param jobs: number of repositories to refresh in parallel
+    :type jobs: int or None
+    :return entries: dict of new state entries keyed by directory name
+    :rtype: dict
+    """
+
+    def snapshot_worker(name):
+        repo_dir = top_dir / name
+        stamp = get_ref_stamp(repo_dir)
+        try:
+            status = get_repo_status(repo_dir)
+        except (sp.CalledProcessError, OSError) as exc:
+            logging.warning('Cannot read status for %s: %s', name, exc)
+            return None
+        emit_result('watch', name, **status)
+        return {
+            'dir': name,
+            'head': status.head,
+            'branch': status.branch,
+            'stamp': stamp,
+            'status': dict(status),
+        }
+
+    entries = map_repos(snapshot_worker, dir_names, jobs)
+    entries = {x: y for x, y in zip(dir_names, entries) if y is not None}
+    update_repo_state(top_dir, entries)
+    return entries
+
+
 def resolve_top_dir(upath):
     """
     Resolve top_dir, ie, containing directory for git repositories. The
@@ -201,10 +1205,68 @@ def resolve_top_dir(upath):
     return workpath, userpath
 
 
+def save_repo_state(top_dir, state):
+    """
+    Save the workspace state file in ``top_dir``. Note the file is written
+    in place so updates do not change the ``top_dir`` mtime.
+
+    :param top_dir: top-level repository directory
+    :type top_dir: Path obj
+    :param state: workspace state data
+    :type state: dict
+    """
+    try:
+        top_dir.joinpath(STATE_FILE).write_text(
+            json.dumps(state, indent=2, sort_keys=True), encoding='utf-8'
+        )
+    except OSError as exc:
+        logging.warning('Could not save repo state: %s', exc)
+
+
+def write_locked_cfg(ucfg, ufile, test=None):
+    """
+    Write a new config file with '-locked' appended to the name.
+
+    :param ucfg: Munch configuration object with ``repo_hash`` values
+    :type ucfg: Munch cfgobj
+    :param ufile: active config file
+    :type ufile: Path obj
+    :param test: test path for locked config file
+    :type test: str or None
+    """
+    from munch import Munch
+
+    cfg_name = f'{ufile.stem}-locked{ufile.suffix}'
+    locked_cfg_name = cfg_name if not test else Path(test).joinpath(cfg_name)
+    cfg_data = Munch(ucfg)
+    cfg_data.repos = [
+        x.to_dict(compact=True) if isinstance(x, RepoSpec) else x for x in ucfg.repos
+    ]
+    Path(locked_cfg_name).write_text(Munch.toYAML(cfg_data), encoding='utf-8')
+    logging.info('Locked config: %s', locked_cfg_name)
+
+
+def update_repo_state(top_dir, entries):
+    """
+    Merge new state entries into the workspace state file.
+
+    :param top_dir: top-level repository directory
+    :type top_dir: Path obj
+    :param entries: state entries keyed by directory name
+    :type entries: dict
+    """
+    if not entries:
+        return
+    state = load_repo_state(top_dir)
+    for name, entry in entries.items():
+        state['repos'][name] = {**state['repos'].get(name, {}), **entry}
+    save_repo_state(top_dir, state)
+
+
 def parse_config(ucfg):
     """
     Parse config file options and build list of repo objects. Return list
-    of global options and list of Munch repo objects.
+    of global options and list of enabled ``RepoSpec`` repo objects.
 
     :param ucfg: Munch configuration object extracted from config file
     :type ucfg: Munch cfgobj
@@ -213,7 +1275,7 @@ def parse_config(ucfg):
     urepos = []
     udir = ucfg.top_dir
     urebase = ucfg.pull_with_rebase
-    for item in [x for x in ucfg.repos if x.repo_enable]:
+    for item in enabled_repos(ucfg.repos):
         urepos.append(item)
     return [udir, urebase], urepos
 
@@ -234,15 +1296,6 @@ def create_locked_cfg(ucfg, ufile, quiet, test=None):
     :type test: str or None
     :raises DirectoryTypeError: if repo state is invalid
     """
-
-    def write_locked_cfg(ucfg, ufile, test=None):
-        """
-        Write a new config file with '-locked' appended to the name.
-        """
-        cfg_name = f'{ufile.stem}-locked{ufile.suffix}'
-        locked_cfg_name = cfg_name if not test else Path(test).joinpath(cfg_name)
-        Path(locked_cfg_name).write_text(Munch.toYAML(ucfg), encoding='utf-8')
-
     work_dir, top_dir = resolve_top_dir(ucfg.top_dir)
     logging.debug('Using top-level repo dir: %s', str(top_dir))
 
@@ -250,27 +1303,101 @@ def create_locked_cfg(ucfg, ufile, quiet, test=None):
     if not valid_repo_state:
         raise DirectoryTypeError('Cannot lock cfg with mismatched directories')
 
-    git_action = 'git rev-parse --verify HEAD'
-    logging.debug('Get hash cmd: %s', git_action)
     checkout_cmd = 'git checkout -q ' if quiet else 'git checkout '
-    for item in [x for x in ucfg.repos if x.repo_enable]:
+    repos = enabled_repos(ucfg.repos)
+    dir_names = [x.repo_alias if x.repo_alias else x.repo_name for x in repos]
+    repo_state = get_repo_state(top_dir, dir_names)
+    for item in repos:
         git_dir = item.repo_alias if item.repo_alias else item.repo_name
         os.chdir(git_dir)
-        item.repo_hash = sp.check_output(split(git_action), text=True).strip()
+        item.repo_hash = repo_state[git_dir]['head']
         logging.debug('Repository %s HEAD is %s', str(git_dir), item.repo_hash)
+        emit_result('lock', git_dir, repo_hash=item.repo_hash, branch=item.repo_branch)
         git_checkout = checkout_cmd + f'{item.repo_hash}'
         logging.debug('Checkout cmd: %s', git_checkout)
-        sp.check_call(split(git_checkout))
+        run_traced(sp.check_call, split(git_checkout))
 
         os.chdir(top_dir)
     os.chdir(work_dir)
     write_locked_cfg(ucfg, ufile, test)
 
 
-def create_repo_tags(ucfg, utag, test=None):
+def create_remote_locked_cfg(ucfg, ufile, jobs=None, test=None):
+    """
+    Create a 'locked' cfg file without a local workspace, ie, resolve each
+    configured ``repo_branch`` to a commit hash by querying the remotes
+    (concurrently) and write a new config file with '-locked' appended
+    to the name.
+
+    :param ucfg: Munch configuration object extracted from config file
+    :type ucfg: Munch cfgobj
+    :param ufile: active config file
+    :type ufile: Path obj
+    :param jobs: number of remotes to query in parallel
+    :type jobs: int or None
+    :param test: test path for locked config file
+    :type test: str or None
+    :raises RepoProcessError: if any branch cannot be resolved
+    """
+
+    _, top_dir = resolve_top_dir(ucfg.top_dir)
+
+    def resolve_branch(item):
+        repo_url_str = resolve_repo_url(check_repo_url(item.repo_url), top_dir)
+        git_dir = item.repo_alias if item.repo_alias else item.repo_name
+        try:
+            commit_hash = get_remote_ref(repo_url_str, f'refs/heads/{item.repo_branch}')
+        except (sp.CalledProcessError, OSError) as exc:
+            logging.error('Cannot query remote for %s: %s', item.repo_name, exc)
+            commit_hash = None
+        emit_result(
+            'lock',
+            git_dir,
+            status='ok' if commit_hash else 'failed',
+            repo_hash=commit_hash,
+            branch=item.repo_branch,
+        )
+        return commit_hash
+
+    repos = enabled_repos(ucfg.repos)
+    hashes = map_repos(resolve_branch, repos, jobs)
+    missing = [x.repo_name for x, y in zip(repos, hashes) if y is None]
+    if missing:
+        raise RepoProcessError(f'Cannot resolve branch for: {", ".join(missing)}')
+    for item, commit_hash in zip(repos, hashes):
+        item.repo_hash = commit_hash
+        logging.debug('Repository %s remote HEAD is %s', item.repo_name, commit_hash)
+    write_locked_cfg(ucfg, ufile, test)
+
+
+def check_repo_tags(ucfg, utag):
+    """
+    Check if a tag exists in each enabled repository (using the in-process
+    ref reader, falling back to ``git rev-parse`` if needed).
+
+    :param ucfg: Munch configuration object extracted from config file
+    :type ucfg: Munch cfgobj
+    :param utag: tag name
+    :type utag: str
+    :return has_tag: dict of Booleans keyed by directory name
+    :rtype: dict
+    """
+    _, top_dir = resolve_top_dir(ucfg.top_dir)
+    has_tag = {}
+    for item in enabled_repos(ucfg.repos):
+        git_dir = item.repo_alias if item.repo_alias else item.repo_name
+        commit = get_ref_hash(top_dir / str(git_dir), f'refs/tags/{utag}')
+        has_tag[git_dir] = commit is not None
+        emit_result('has-tag', git_dir, tag=utag, exists=has_tag[git_dir])
+    return has_tag
+
+
+def create_repo_tags(ucfg, utag, test=None, jobs=None):
     """
-    Create a new signed or annotated tag in each configured repository.
-    (re)Set the gpg signing key from user config.
+    Create a new signed or annotated tag in each configured repository,
+    using the gpg signing key from user config (if set). Repositories are
+    tagged in parallel, but signed tags are created one at a time so any
+    gpg (pinentry) prompts do not overlap. Only the new tag ref is pushed.
 
     :param ucfg: Munch configuration object extracted from config file
     :type ucfg: Munch cfgobj
@@ -278,54 +1405,318 @@ def create_repo_tags(ucfg, utag, test=None):
     :type utag: str obj
     :param test: test path for config file
     :type test: str or None
+    :param jobs: number of parallel tagging jobs
+    :type jobs: int or None
     :raises DirectoryTypeError: if repo state is invalid
     """
 
     work_dir, top_dir = resolve_top_dir(ucfg.top_dir)
     valid_repo_state = check_repo_state(ucfg)
+    os.chdir(work_dir)
     if not valid_repo_state:
         raise DirectoryTypeError('Cannot process cmd with mismatched directories')
 
-    git_action = 'git config user.signingkey '
-    logging.debug('Git action: %s', git_action)
-    git_check_tag = 'git tag -l'
-    git_push_tag = 'git push --tags'
-    tag_base = 'git tag '
-    for item in [x for x in ucfg.repos if x.repo_enable]:
-        git_action = (
-            git_action + f'{item.repo_signing_key}'
-            if item.repo_create_tag_signed
-            else 'git status -s'
-        )
-        tag_cmd = tag_base + '-s ' if item.repo_create_tag_signed else tag_base + '-a '
+    sign_lock = threading.Lock()
+
+    def tag_worker(item):
         repo_tag = item.repo_create_tag_new if item.repo_create_tag_new else utag
         logging.debug('Git tag resolved to: %s', repo_tag)
-        git_tag_cmd = tag_cmd + f'{repo_tag} -m "{item.repo_create_tag_msg}"'
+        if repo_tag is None:
+            return
+        git_dir = item.repo_alias if item.repo_alias else item.repo_name
+        repo_dir = top_dir / str(git_dir)
+        tag_hash = get_ref_hash(repo_dir, f'refs/tags/{repo_tag}')
+        logging.debug('%s tag %s is %s', str(git_dir), repo_tag, tag_hash)
+        if tag_hash is not None:
+            emit_result('tag', git_dir, status='exists', tag=repo_tag, pushed=False)
+            return
+
+        if item.repo_create_tag_signed:
+            tag_opt = f'-u {item.repo_signing_key}' if item.repo_signing_key else '-s'
+        else:
+            tag_opt = '-a'
+        git_tag_cmd = f'git tag {tag_opt} {repo_tag} -m "{item.repo_create_tag_msg}"'
+        logging.debug('Tag cmd: %s', git_tag_cmd)
+        if item.repo_create_tag_signed:
+            with sign_lock:
+                run_traced(sp.check_call, split(git_tag_cmd), cwd=repo_dir)
+        else:
+            run_traced(sp.check_call, split(git_tag_cmd), cwd=repo_dir)
+
+        if item.repo_push_new_tags and not test:
+            git_push_tag = f'git push {item.repo_remote} refs/tags/{repo_tag}'
+            logging.debug('Push cmd: %s', git_push_tag)
+            run_traced(sp.check_call, split(git_push_tag), cwd=repo_dir)
+        emit_result(
+            'tag',
+            git_dir,
+            status='created',
+            tag=repo_tag,
+            pushed=bool(item.repo_push_new_tags and not test),
+        )
 
-        if repo_tag is not None:
-            git_dir = item.repo_alias if item.repo_alias else item.repo_name
-            os.chdir(git_dir)
-            tag_data = sp.check_output(split(git_check_tag), text=True).splitlines()
-            logging.debug('%s tag list: %s', str(git_dir), tag_data)
-            if repo_tag in tag_data:
-                os.chdir(top_dir)
-                continue
-
-            sp.check_call(split(git_action))
-            logging.debug('Tag cmd: %s', git_tag_cmd)
-            sp.check_call(split(git_tag_cmd))
-
-            if item.repo_push_new_tags and not test:
-                logging.debug('Push cmd: %s', git_push_tag)
-                sp.check_call(split(git_push_tag))
-
-            os.chdir(top_dir)
+    map_repos(tag_worker, enabled_repos(ucfg.repos), jobs)
+
+
+def export_repo_bundles(ucfg, bundle_dir, quiet=False, jobs=None):
+    """
+    Write a git bundle (with all refs) for each enabled repository in
+    ``top_dir``, eg, to seed workspaces on hosts with slow or no access
+    to the upstream remotes.
+
+    :param ucfg: Munch configuration object extracted from config file
+    :type ucfg: Munch cfgobj
+    :param bundle_dir: output directory for bundle files
+    :type bundle_dir: Path or str
+    :param quiet: Suppress some git output
+    :type quiet: Boolean
+    :param jobs: number of repositories to process in parallel
+    :type jobs: int or None
+    :raises DirectoryTypeError: if repo state is invalid
+    :raises RepoProcessError: if any bundle could not be created
+    """
+    work_dir, top_dir = resolve_top_dir(ucfg.top_dir)
+    valid_repo_state = check_repo_state(ucfg)
     os.chdir(work_dir)
+    if not valid_repo_state:
+        raise DirectoryTypeError('Cannot export bundles with mismatched directories')
+
+    bundle_path = Path(bundle_dir).resolve()
+    bundle_path.mkdir(parents=True, exist_ok=True)
+    bundle_cmd = 'git bundle create -q ' if quiet else 'git bundle create '
+
+    def create_bundle(item):
+        git_dir = item.repo_alias if item.repo_alias else item.repo_name
+        bundle_file = bundle_path / f'{git_dir}.bundle'
+        try:
+            run_cmd(bundle_cmd + f'{bundle_file} --all', top_dir / str(git_dir))
+        except (sp.CalledProcessError, OSError) as exc:
+            logging.error('Cannot create bundle for %s: %s', str(git_dir), exc)
+            return git_dir
+        logging.info('Bundle file: %s', bundle_file)
+        return None
+
+    repos = enabled_repos(ucfg.repos)
+    failed = [x for x in map_repos(create_bundle, repos, jobs) if x is not None]
+    if failed:
+        raise RepoProcessError(f'Cannot create bundles for: {", ".join(failed)}')
+
+
+def run_cmd(cmd_str, cwd=None, output=None):
+    """
+    Run a command string in the given directory. If an ``output`` buffer
+    is provided, capture the (combined) command output and append it to
+    the buffer instead of writing it to the console.
+
+    :param cmd_str: full command string
+    :type cmd_str: str
+    :param cwd: working directory for the command
+    :type cwd: Path or str or None
+    :param output: optional output buffer
+    :type output: list or None
+    :raises CalledProcessError: if the command fails
+    """
+    logging.debug('Running cmd: %s', cmd_str)
+    if output is None:
+        run_traced(sp.check_call, split(cmd_str), cwd=cwd)
+        return
+    proc = run_traced(
+        sp.run,
+        split(cmd_str),
+        cwd=cwd,
+        stdout=sp.PIPE,
+        stderr=sp.STDOUT,
+        text=True,
+        check=False,
+    )
+    output.append(proc.stdout)
+    if proc.returncode:
+        raise sp.CalledProcessError(proc.returncode, cmd_str, output=proc.stdout)
 
 
-def process_git_repos(flags, repos, pull, quiet):
+def seed_repo_from_bundle(item, bundle, repo_dir, quiet, filter_spec=None, output=None):
+    """
+    Seed a new (empty) repository from a local git bundle, then fetch any
+    newer objects from the real remote, but only if it is reachable. The
+    bundle branches become remote-tracking branches, as if cloned from the
+    remote.
+
+    :param item: repository obj (from yaml cfg)
+    :type item: Munch obj
+    :param bundle: path to bundle file
+    :type bundle: Path obj
+    :param repo_dir: path to repository directory (with remote added)
+    :type repo_dir: Path obj
+    :param quiet: Suppress some git output
+    :type quiet: Boolean
+    :param filter_spec: optional partial clone filter
+    :type filter_spec: str or None
+    :param output: optional buffer for captured command output
+    :type output: list or None
+    :return is_reachable: True if the remote was reachable
+    :rtype: Boolean
+    :raises CalledProcessError: if fetching from the bundle fails
+    """
+    fetch_opts = '-q ' if quiet else ''
+    remote = item.repo_remote
+    git_fetch_bundle = (
+        f'git fetch {fetch_opts}{bundle} '
+        f'refs/heads/*:refs/remotes/{remote}/* refs/tags/*:refs/tags/*'
+    )
+    logging.debug('Seeding %s from bundle %s', repo_dir.name, bundle)
+    run_cmd(git_fetch_bundle, repo_dir, output)
+
+    git_ls_remote = f'git ls-remote --exit-code -h {remote}'
+    try:
+        run_traced(
+            sp.run,
+            split(git_ls_remote),
+            cwd=repo_dir,
+            capture_output=True,
+            check=True,
+            timeout=REMOTE_TIMEOUT,
+        )
+    except (sp.CalledProcessError, sp.TimeoutExpired, OSError) as exc:
+        logging.warning('Remote for %s is not reachable: %s', repo_dir.name, exc)
+        return False
+
+    if filter_spec:
+        fetch_opts += f'--filter={filter_spec} '
+    run_cmd(f'git fetch {fetch_opts}--tags {remote}', repo_dir, output)
+    return True
+
+
+def sync_git_repo(item, flags, pull, quiet, output=None, bundle_dir=None):
+    """
+    Clone or update a single git repository obj in ``top_dir``, ie, run the
+    full chain of git commands for one repository.
+
+    :param item: repository obj (from yaml cfg)
+    :type item: Munch obj
+    :param flags: List of options, ie, top_dir Path obj, rebase, lfs, lock
+    :type flags: list
+    :param pull: Update if True, else clone and checkout
+    :type pull: Boolean
+    :param quiet: Suppress some git output
+    :type quiet: Boolean
+    :param output: optional buffer for captured command output
+    :type output: list or None
+    :param bundle_dir: optional directory of git bundles to seed new clones
+    :type bundle_dir: Path or str or None
+    :return entry: updated state entry for this repository
+    :rtype: dict
+    :raises CalledProcessError: if any git command fails
+    """
+    top_dir, urebase, has_lfs, ulock = flags
+    checkout_cmd = 'git checkout -q ' if quiet else 'git checkout '
+    submodule_cmd = 'git submodule update --init --recursive'
+    git_lfs_install = 'git lfs install'
+
+    git_quiet = '-q '
+    git_action = 'git clone '
+    if pull:  # baseline update action, overrides repo-level option
+        git_action = get_update_action(urebase)
+    if quiet:
+        git_action = git_action + git_quiet
+
+    # relative paths also need to work as the remote url of an init'd repo
+    repo_url_str = resolve_repo_url(check_repo_url(item.repo_url), top_dir)
+    logging.debug('Make sure repo_url is a string => %r', repo_url_str)
+    filter_spec = get_clone_filter(item)
+    # one fetch for the configured branch and tags, then update locally
+    tracking_ref = f'refs/remotes/{item.repo_remote}/{item.repo_branch}'
+    fetch_refspec = f'+refs/heads/{item.repo_branch}:{tracking_ref}'
+    git_fetch = f'git fetch --tags {item.repo_remote} {fetch_refspec}'
+    if filter_spec:
+        # the fetch also sets the filter for subsequent fetches
+        git_fetch = (
+            f'git fetch --filter={filter_spec} --tags {item.repo_remote} {fetch_refspec}'
+        )
+    if filter_spec and not pull:
+        git_action = git_action + f'--filter={filter_spec} '
+        # git ignores filters for local clones unless given a file:// url
+        url_path = Path(repo_url_str)
+        if url_path.is_absolute() and url_path.exists():
+            repo_url_str = url_path.as_uri()
+    git_checkout = checkout_cmd + f'{item.repo_branch}'
+    git_dir = item.repo_alias if item.repo_alias else item.repo_name
+    repo_dir = top_dir / str(git_dir)
+    logging.debug('Operating in git_dir: %s', git_dir)
+    if not pull:
+        if item.repo_depth > 0 and item.repo_branch:
+            git_action = git_action + f'-b {item.repo_branch} '
+        logging.debug('Checkout cmd: %s', git_checkout)
+        if item.repo_depth > 0:
+            git_action = git_action + f'--depth {item.repo_depth} '
+        git_clone = git_action + f'{repo_url_str} '
+        if item.repo_alias:
+            git_clone += item.repo_alias
+        bundle = Path(bundle_dir, f'{git_dir}.bundle') if bundle_dir else None
+        seed_repo = bundle is not None and bundle.is_file()
+        if seed_repo or (ulock and item.repo_hash):
+            git_init = 'git init -q ' if quiet else 'git init '
+            run_cmd(git_init + str(git_dir), top_dir, output)
+            try:
+                run_cmd(
+                    f'git remote add {item.repo_remote} {repo_url_str}', repo_dir, output
+                )
+                if seed_repo:
+                    seed_repo_from_bundle(
+                        item, bundle, repo_dir, quiet, filter_spec, output
+                    )
+                if ulock and item.repo_hash:
+                    # locked config: only fetch the pinned commit (if needed)
+                    fetch_repo_hash(item, repo_dir, quiet, filter_spec, output)
+                    run_cmd(checkout_cmd + f'{item.repo_hash}', repo_dir, output)
+                else:
+                    run_cmd(git_checkout, repo_dir, output)
+            except (sp.CalledProcessError, OSError):
+                # do not leave a half-initialized repo (later syncs skip it)
+                rmtree(repo_dir, ignore_errors=True)
+                raise
+        else:
+            logging.debug('Clone cmd: %s', git_clone)
+            run_cmd(git_clone, top_dir, output)
+            run_cmd(git_checkout, repo_dir, output)
+        if item.repo_init_submodules:
+            run_cmd(submodule_cmd, repo_dir, output)
+        if item.repo_has_lfs_files and has_lfs is not None:
+            run_cmd(git_lfs_install, repo_dir, output)
+    else:
+        if item.repo_use_rebase and not urebase:
+            git_action = get_update_action(True)
+            if quiet:
+                git_action = git_action + git_quiet
+        if item.repo_init_submodules:
+            submodule_cmd = 'git submodule update --recursive'
+        git_update = git_action + tracking_ref
+        if output is None:
+            logging.info('Current repository is %s', str(git_dir))
+        if ulock:
+            checkout_lock = checkout_cmd + f'{item.repo_hash}'
+            fetch_repo_hash(item, repo_dir, quiet, filter_spec, output)
+            logging.debug('Checkout cmd: %s', checkout_lock)
+            run_cmd(checkout_lock, repo_dir, output)
+        else:
+            logging.debug('Fetch cmd: %s', git_fetch)
+            run_cmd(git_fetch, repo_dir, output)
+            run_cmd(git_checkout, repo_dir, output)
+            logging.debug('Update cmd: %s', git_update)
+            run_cmd(git_update, repo_dir, output)
+            if item.repo_init_submodules:
+                run_cmd(submodule_cmd, repo_dir, output)
+
+    entry = read_repo_state(repo_dir, item.repo_remote, item.repo_branch)
+    entry['synced'] = time.time()
+    return entry
+
+
+def process_git_repos(flags, repos, pull, quiet, jobs=1, probe=False, bundle_dir=None):
     """
     Process list of git repository objs and populate/update ``top_dir``.
+    With more than one job, each repository is processed in a worker pool,
+    its output is printed as one block when it finishes, and any failures
+    are summarized at the end of the run.
 
     :param flags: List of options (from yaml cfg)
     :type flags: list
@@ -335,10 +1726,18 @@ def process_git_repos(flags, repos, pull, quiet):
     :type pull: Boolean
     :param quiet: Suppress some git output
     :type quiet: Boolean
+    :param jobs: number of repositories to process in parallel
+    :type jobs: int or None
+    :param probe: on update, skip repositories that are already current
+    :type probe: Boolean
+    :param bundle_dir: optional directory of git bundles to seed new clones
+    :type bundle_dir: Path or str or None
     :raises FileExistsError: if cloning on top of existing directories
+    :raises ValueError: if any ``repo_opts`` are not supported
+    :raises RepoProcessError: if any repositories failed in parallel mode
     """
     udir, urebase, has_lfs, ulock = flags
-    work_dir, top_dir = resolve_top_dir(udir)
+    _, top_dir = resolve_top_dir(udir)
     logging.debug('Running with top-level repo dir: %s', str(top_dir))
     try:
         top_dir.mkdir(parents=True, exist_ok=True)
@@ -347,10 +1746,7 @@ def process_git_repos(flags, repos, pull, quiet):
 
     # find any existing directories and check for name clash
     if not pull:
-        path_list = sorted([x for x in top_dir.iterdir() if x.is_dir()])
-        top_dir_list = []
-        for path in path_list:
-            top_dir_list.append(path.stem)
+        top_dir_list = list_repo_dirs(top_dir)
         repo_name_list = []
         for item in repos:
             dir_name = item.repo_alias if item.repo_alias else item.repo_name
@@ -364,118 +1760,267 @@ def process_git_repos(flags, repos, pull, quiet):
             raise FileExistsError(
                 'Git cannot clone when config matches existing directories'
             )
-
-    os.chdir(top_dir)
-    checkout_cmd = 'git checkout -q ' if quiet else 'git checkout '
-    submodule_cmd = 'git submodule update --init --recursive'
-    git_lfs_install = 'git lfs install'
+        repos = [
+            x
+            for x in repos
+            if (x.repo_alias if x.repo_alias else x.repo_name)
+            not in dir_name_repo_intersect
+        ]
+        logging.debug('Skipping existing repos: %s', sorted(dir_name_repo_intersect))
 
     for item in repos:
-        # need to reset git_action for each repository
-        git_quiet = '-q '
-        git_action = 'git clone '
-        if pull:  # baseline git pull action, overrides repo-level option
-            git_action = 'git pull --rebase=merges ' if urebase else 'git pull --ff-only '
-        if quiet:
-            git_action = git_action + git_quiet
+        get_clone_filter(item)  # fail early on bad repo_opts
 
-        repo_url_str = check_repo_url(item.repo_url)
-        logging.debug('Make sure repo_url is a string => %r', repo_url_str)
-        git_fetch = f'git fetch --tags {item.repo_remote}'
-        git_checkout = checkout_cmd + f'{item.repo_branch}'
+    if pull and probe:
+        probe_jobs = jobs if jobs and jobs > 1 else None
+        is_current = map_repos(
+            lambda x: check_repo_current(x, top_dir, ulock), repos, probe_jobs
+        )
+        for item, current in zip(repos, is_current):
+            if current:
+                git_dir = item.repo_alias if item.repo_alias else item.repo_name
+                logging.info('Repository %s is up-to-date', str(git_dir))
+                emit_result('update', git_dir, status='unchanged')
+        repos = [x for x, current in zip(repos, is_current) if not current]
+
+    repo_flags = [top_dir, urebase, has_lfs, ulock]
+    cmd_name = 'update' if pull else 'sync'
+    synced = {}
+    if not jobs or jobs <= 1:
+        try:
+            for item in repos:
+                git_dir = item.repo_alias if item.repo_alias else item.repo_name
+                try:
+                    with trace_repo(str(git_dir)):
+                        entry = sync_git_repo(
+                            item, repo_flags, pull, quiet, bundle_dir=bundle_dir
+                        )
+                except (sp.CalledProcessError, OSError) as exc:
+                    emit_result(cmd_name, git_dir, status='failed', error=str(exc))
+                    raise
+                synced[git_dir] = entry
+                emit_result(cmd_name, git_dir, status='ok', **entry)
+        finally:
+            update_repo_state(top_dir, synced)
+        return
+
+    def sync_worker(item):
+        output = []
         git_dir = item.repo_alias if item.repo_alias else item.repo_name
-        logging.debug('Operating in git_dir: %s', git_dir)
-        if not pull:
-            if item.repo_depth > 0 and item.repo_branch:
-                git_action = git_action + f'-b {item.repo_branch} '
-            logging.debug('Checkout cmd: %s', git_checkout)
-            if git_dir in list(dir_name_repo_intersect):
-                logging.debug('Skipping existing repo: %s', git_dir)
-            else:
-                if item.repo_depth > 0:
-                    git_action = git_action + f'--depth {item.repo_depth} '
-                git_clone = git_action + f'{repo_url_str} '
-                if item.repo_alias:
-                    git_clone += item.repo_alias
-                logging.debug('Clone cmd: %s', git_clone)
-                sp.check_call(split(git_clone))
-                os.chdir(git_dir)
-                sp.check_call(split(git_checkout))
-                if item.repo_init_submodules:
-                    sp.check_call(split(submodule_cmd))
-                if item.repo_has_lfs_files and has_lfs is not None:
-                    sp.check_call(split(git_lfs_install))
-        else:
-            if item.repo_use_rebase and not urebase:
-                git_action = 'git pull --rebase=merges '
-            if item.repo_init_submodules:
-                submodule_cmd = 'git submodule update --recursive'
-            git_pull = git_action + f'{item.repo_remote} {item.repo_branch}'
-            if ulock:
-                checkout_lock = checkout_cmd + f'{item.repo_hash}'
-            try:
-                os.chdir(git_dir)
-            except OSError as exc:
-                logging.exception("Could not change to repo directory: %s", exc)
-
+        try:
+            with trace_repo(str(git_dir)):
+                entry = sync_git_repo(item, repo_flags, pull, quiet, output, bundle_dir)
+        except (sp.CalledProcessError, OSError) as exc:
+            return output, None, exc
+        return output, entry, None
+
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(sync_worker, item): item for item in repos}
+        for future in as_completed(futures):
+            item = futures[future]
+            git_dir = item.repo_alias if item.repo_alias else item.repo_name
+            output, entry, exc = future.result()
             logging.info('Current repository is %s', str(git_dir))
-            if ulock:
-                logging.debug('Checkout cmd: %s', git_checkout)
-                sp.check_call(split(checkout_lock))
+            out_stream = sys.stderr if is_streaming() else sys.stdout
+            out_stream.write(''.join(output))
+            out_stream.flush()
+            if exc is not None:
+                logging.error('Repository %s failed: %s', str(git_dir), exc)
+                failed.append((git_dir, exc))
+                emit_result(cmd_name, git_dir, status='failed', error=str(exc))
             else:
-                logging.debug('Fetch cmd: %s', git_fetch)
-                sp.check_call(split(git_fetch))
-                sp.check_call(split(git_checkout))
-                logging.debug('Pull cmd: %s', git_pull)
-                sp.check_call(split(git_pull))
-                if item.repo_init_submodules:
-                    sp.check_call(split(submodule_cmd))
+                synced[git_dir] = entry
+                emit_result(cmd_name, git_dir, status='ok', **entry)
+    update_repo_state(top_dir, synced)
+
+    if failed:
+        logging.error('%d of %d repositories failed:', len(failed), len(repos))
+        for git_dir, exc in failed:
+            logging.error('  %s: %s', git_dir, exc)
+        raise RepoProcessError(
+            f'Failed repositories: {", ".join(sorted(str(x[0]) for x in failed))}'
+        )
 
-        os.chdir(top_dir)
+
+def optimize_repo(repo_dir, quiet=False):
+    """
+    Optimize the object storage of one repository, ie, write an incremental
+    commit-graph, pack any loose objects, remove loose objects that are
+    already packed, then write a multi-pack-index and combine the smaller
+    packs (all but the largest, as in ``git maintenance``) into one.
+
+    :param repo_dir: path to repository directory
+    :type repo_dir: Path obj
+    :param quiet: Suppress git progress output
+    :type quiet: Boolean
+    :return counts: tuple of object counts before and after
+    :rtype: tuple
+    :raises CalledProcessError: if any git command fails
+    """
+    progress = ['--no-progress'] if quiet else []
+    before = get_object_counts(repo_dir)
+    cmds = [
+        ['git', 'commit-graph', 'write', '--reachable', '--split'] + progress,
+        ['git', 'repack', '-d'] + (['-q'] if quiet else []),
+        ['git', 'prune-packed'] + (['-q'] if quiet else []),
+        ['git', 'multi-pack-index', 'write'] + progress,
+    ]
+    for cmd in cmds:
+        run_traced(sp.check_call, cmd, cwd=repo_dir)
+
+    pack_dir = get_common_dir(find_git_dir(repo_dir) or repo_dir / '.git')
+    pack_sizes = sorted(x.stat().st_size for x in pack_dir.glob('objects/pack/*.pack'))
+    if len(pack_sizes) > 1:
+        batch_size = pack_sizes[-2] + 1
+        midx_repack = ['git', 'multi-pack-index', 'repack', f'--batch-size={batch_size}']
+        run_traced(sp.check_call, midx_repack + progress, cwd=repo_dir)
+        midx_expire = ['git', 'multi-pack-index', 'expire']
+        run_traced(sp.check_call, midx_expire + progress, cwd=repo_dir)
+    return before, get_object_counts(repo_dir)
+
+
+def optimize_repos(ucfg, quiet=False, jobs=None):
+    """
+    Optimize the object storage of each enabled repository in parallel
+    (see ``optimize_repo``) and report the object and pack counts before
+    and after.
+
+    :param ucfg: Munch configuration object extracted from config file
+    :type ucfg: Munch cfgobj
+    :param quiet: Suppress git progress output
+    :type quiet: Boolean
+    :param jobs: number of repositories to process in parallel
+    :type jobs: int or None
+    :return results: dict of (before, after) counts keyed by directory name
+    :rtype: dict
+    :raises DirectoryTypeError: if repo state is invalid
+    :raises RepoProcessError: if any repository could not be optimized
+    """
+    work_dir, top_dir = resolve_top_dir(ucfg.top_dir)
+    valid_repo_state = check_repo_state(ucfg)
     os.chdir(work_dir)
+    if not valid_repo_state:
+        raise DirectoryTypeError('Cannot optimize with mismatched directories')
+
+    def optimize_worker(item):
+        git_dir = item.repo_alias if item.repo_alias else item.repo_name
+        try:
+            with trace_repo(git_dir):
+                before, after = optimize_repo(top_dir / str(git_dir), quiet)
+        except (sp.CalledProcessError, OSError) as exc:
+            logging.error('Cannot optimize %s: %s', str(git_dir), exc)
+            emit_result('optimize', git_dir, status='failed', error=str(exc))
+            return git_dir, None
+        logging.info(
+            'Repository %s: %d loose objects, %d packs (%d KiB) -> '
+            '%d loose objects, %d packs (%d KiB)',
+            str(git_dir),
+            before['count'],
+            before['packs'],
+            before['size'] + before['size-pack'],
+            after['count'],
+            after['packs'],
+            after['size'] + after['size-pack'],
+        )
+        emit_result('optimize', git_dir, status='ok', before=before, after=after)
+        return git_dir, (before, after)
 
+    results = dict(map_repos(optimize_worker, enabled_repos(ucfg.repos), jobs))
+    failed = [x for x, y in results.items() if y is None]
+    if failed:
+        raise RepoProcessError(f'Cannot optimize: {", ".join(failed)}')
+    return results
 
-def process_repo_changes(ucfg):
+
+def process_repo_changes(ucfg, jobs=None):
     """
     Generate a changelog for any repos with the ``repo_gen_changes`` flag
     set. Note we do not check repo state here, we just process each valid
-    repo entry.
+    repo entry. Changelogs are cached in the workspace state file by base
+    tag, current tag, and HEAD, so unchanged repos are skipped, and if only
+    new commits were added since a tagged HEAD, just the new range is
+    generated and merged into the existing file.
 
     :param ucfg: Munch configuration object extracted from config file
     :type ucfg: Munch cfgobj
-    :param quiet: pass the ``quiet`` cmd line flag to install cmd
+    :param jobs: number of parallel changelog jobs
+    :type jobs: int or None
     """
     work_dir, top_dir = resolve_top_dir(ucfg.top_dir)
     valid_repo_state = check_repo_state(ucfg)
+    os.chdir(work_dir)
     if not valid_repo_state:
         raise DirectoryTypeError('Inconsistent directories; try running repolite first?')
 
-    git_get_tags = 'git tag --sort=taggerdate'
-    git_check_tag = 'git tag --points-at'
+    git_last_tag = (
+        'git for-each-ref --sort=-taggerdate --count=1 --format=%(refname:short)'
+    )
+    git_last_tag += ' refs/tags'
+    repo_states = load_repo_state(top_dir)['repos']
 
-    for item in [x for x in ucfg.repos if x.repo_enable and x.repo_gen_changes]:
+    from munch import Munch
+
+    def changes_worker(item):
         repo = Munch()
         repo.name = item.repo_name
-        repo.item = Munch(item)
-        git_dir = item.repo_alias if item.repo_alias else item.repo_name
-        os.chdir(git_dir)
+        repo.item = item
+        git_dir = str(item.repo_alias if item.repo_alias else item.repo_name)
+        repo_dir = top_dir / git_dir
+        head, _ = get_repo_head(repo_dir)
 
-        all_tags = sp.check_output(split(git_get_tags), text=True).splitlines()
-        logging.debug('%s tag list: %s', item.repo_name, all_tags)
-        commit_tags = sp.check_output(split(git_check_tag), text=True).splitlines()
+        commit_tags = get_head_tags(repo_dir)
         logging.debug('commit tag(s): %s', commit_tags)
-        last_tag = all_tags[-1] if all_tags and all_tags[-1] in commit_tags else ''
-
-        generate_change_data(repo, item.repo_changelog_base, top_dir, last_tag)
+        last_tag = ''
+        if commit_tags:
+            newest = run_traced(
+                sp.check_output, split(git_last_tag), text=True, cwd=repo_dir
+            ).strip()
+            logging.debug('%s newest tag: %s', item.repo_name, newest)
+            last_tag = newest if newest in commit_tags else ''
+
+        key = {'base': item.repo_changelog_base, 'tag': last_tag, 'head': head}
+        prev = repo_states.get(git_dir, {}).get('changelog')
+        output_file = top_dir / f'{item.repo_name}-CHANGELOG.{item.repo_changelog_ext}'
+        if prev == key and output_file.exists():
+            logging.info('ChangeLog file (unchanged): %s', output_file)
+            emit_result('changelog', git_dir, status='unchanged', file=output_file, **key)
+            return git_dir, key
+
+        prev_tag = None
+        if (
+            prev
+            and output_file.exists()
+            and prev.get('base') == key['base']
+            and prev.get('tag')
+            and prev.get('head') != head
+            and is_ancestor(repo_dir, prev.get('head'), head)
+        ):
+            prev_tag = prev['tag']
+        status = generate_change_data(
+            repo, item.repo_changelog_base, top_dir, last_tag, repo_dir, prev_tag
+        )
+        emit_result('changelog', git_dir, status=status, file=output_file, **key)
+        return git_dir, key
 
-        os.chdir(top_dir)
-    os.chdir(work_dir)
+    items = [x for x in enabled_repos(ucfg.repos) if x.repo_gen_changes]
+    results = map_repos(changes_worker, items, jobs)
+    update_repo_state(top_dir, {name: {'changelog': key} for name, key in results})
 
 
 def process_repo_install(ucfg, quiet):
     """
-    Install any repos with the ``repo_install`` flag set. Note we do not
-    check repo state here, we just process each valid repo entry.
+    Install any repos with the ``repo_install`` flag set, using a single
+    pip command for all of them. Wheels are cached in ``top_dir`` by HEAD
+    commit, so repos whose wheel for the current commit is already
+    installed are skipped, and wheels are only built for repos that
+    changed. Wheels with the same version as the installed one (ie, a new
+    commit without a version change) are force-reinstalled without deps,
+    since pip would skip them. Repos with a dirty work tree are always
+    installed from source. Note we do not check repo state here, we just process each
+    valid repo entry.
 
     :param ucfg: Munch configuration object extracted from config file
     :type ucfg: Munch cfgobj
@@ -484,44 +2029,170 @@ def process_repo_install(ucfg, quiet):
     _, top_dir = resolve_top_dir(ucfg.top_dir)
     logging.debug('Using top-level repo dir: %s', str(top_dir))
 
-    for item in [x for x in ucfg.repos if x.repo_enable and x.repo_install]:
+    state = load_repo_state(top_dir)
+    wheel_files = []
+    forced_wheels = []
+    new_wheels = {}
+    tgt_dirs = []
+    for item in [x for x in enabled_repos(ucfg.repos) if x.repo_install]:
         git_dir = item.repo_alias if item.repo_alias else item.repo_name
         tgt_dir = top_dir / str(git_dir)  # fun with Path objects
-        install_with_pip(tgt_dir, quiet)
+        wheel_key = get_wheel_key(tgt_dir)
+        entry = state['repos'].setdefault(git_dir, {})
+        if wheel_key is None:
+            logging.debug('Repository %s is dirty, installing from source', git_dir)
+            entry.pop('wheel', None)
+            entry.pop('wheel_key', None)
+            tgt_dirs.append(tgt_dir)
+            continue
+        cache_dir = top_dir / WHEEL_CACHE / str(git_dir) / wheel_key
+        with trace_repo(str(git_dir)):
+            wheel_file = get_cached_wheel(cache_dir, tgt_dir, quiet)
+        is_installed = is_wheel_installed(wheel_file)
+        if entry.get('wheel_key') == wheel_key and is_installed:
+            logging.info('Repository %s is already installed', git_dir)
+            emit_result('install', git_dir, status='unchanged', wheel=wheel_file.name)
+            continue
+        entry['wheel'] = wheel_file.name
+        entry['wheel_key'] = wheel_key
+        new_wheels[git_dir] = wheel_file
+        if is_installed:
+            forced_wheels.append(wheel_file)
+        else:
+            wheel_files.append(wheel_file)
+
+    install_with_pip(forced_wheels, quiet, force=True)
+    install_with_pip(wheel_files + tgt_dirs, quiet)
+    save_repo_state(top_dir, state)
+    for git_dir, wheel_file in new_wheels.items():
+        emit_result('install', git_dir, status='installed', wheel=wheel_file.name)
+    for tgt_dir in tgt_dirs:
+        emit_result('install', tgt_dir.name, status='installed', wheel=None)
+
+
+def watch_repo_state(ucfg, jobs=None, debounce=None):
+    """
+    Keep the workspace state file current until interrupted, ie, refresh
+    the status snapshot of each repository when its HEAD, refs, or index
+    change (Linux only). While the watcher runs, ``--show`` and the lock
+    writer use the snapshot instead of reading the repositories.
+
+    :param ucfg: Munch configuration object extracted from config file
+    :type ucfg: Munch cfgobj
+    :param jobs: number of repositories to refresh in parallel
+    :type jobs: int or None
+    :param debounce: seconds a repository must be quiet before a refresh
+    :type debounce: float or None
+    :raises DirectoryTypeError: if repo state is invalid
+    :raises OSError: if inotify is not available
+    """
+    from .watch import WATCH_DEBOUNCE, RepoWatcher
 
+    work_dir, top_dir = resolve_top_dir(ucfg.top_dir)
+    valid_repo_state = check_repo_state(ucfg)
+    os.chdir(work_dir)
+    if not valid_repo_state:
+        raise DirectoryTypeError('Inconsistent directories; try running --update first?')
 
-def show_repo_state(ucfg):
+    lock_file = acquire_watch_lock(top_dir)
+    dir_names = [
+        x.repo_alias if x.repo_alias else x.repo_name for x in enabled_repos(ucfg.repos)
+    ]
+    watcher = RepoWatcher(top_dir, dir_names, debounce or WATCH_DEBOUNCE)
+    try:
+        watcher.start()
+    except OSError:
+        lock_file.close()
+        raise
+    # keep git status from rewriting the (watched) index
+    os.environ['GIT_OPTIONAL_LOCKS'] = '0'
+
+    def refresh(names):
+        start = time.perf_counter()
+        refresh_repo_snapshot(top_dir, names, jobs)
+        logging.info(
+            'Refreshed %s in %.3f s', ', '.join(names), time.perf_counter() - start
+        )
+
+    try:
+        # changes during the first refresh are queued by the watcher
+        refresh(dir_names)
+        logging.info('Watching %d repositories in %s', len(dir_names), top_dir)
+        watcher.run(refresh)
+    finally:
+        watcher.stop()
+        lock_file.close()
+
+
+def show_repo_state(ucfg, jobs=None):
     """
-    Display the current state of each repository using git describe/rev-parse.
+    Display the current state of each repository. Status is collected for
+    all repositories concurrently and displayed in config order.
 
     :param ucfg: Munch configuration object extracted from config file
     :type ucfg: Munch cfgobj
+    :param jobs: number of repositories to query in parallel
+    :type jobs: int or None
     :raises DirectoryTypeError: if repo state is invalid
     """
     work_dir, top_dir = resolve_top_dir(ucfg.top_dir)
     logging.debug('Using top-level repo dir: %s', str(top_dir))
 
     valid_repo_state = check_repo_state(ucfg)
+    os.chdir(work_dir)
     if not valid_repo_state:
         raise DirectoryTypeError('Inconsistent directories; try running --update first?')
 
-    git_action1 = 'git describe --tags --dirty --always'
-    git_action2 = 'git rev-parse --abbrev-ref HEAD'
-    logging.debug('Git describe cmd: %s', git_action1)
-    logging.debug('Git rev-parse cmd: %s', git_action2)
-    for item in [x for x in ucfg.repos if x.repo_enable]:
+    repo_dirs = []
+    for item in enabled_repos(ucfg.repos):
         git_dir = item.repo_alias if item.repo_alias else item.repo_name
-        os.chdir(git_dir)
-        item1_data = sp.check_output(split(git_action1), text=True).strip()
-        item2_data = sp.check_output(split(git_action2), text=True).strip()
+        repo_dirs.append(top_dir / str(git_dir))
+
+    def status_worker(repo_dir):
+        status = get_repo_status(repo_dir)
+        emit_result('show', status.name, **status)
+        return status
+
+    statuses = get_watched_status(top_dir, [x.name for x in repo_dirs])
+    if statuses is not None:
+        logging.debug('Using status snapshot from watcher')
+        for status in statuses:
+            emit_result('show', status.name, **status)
+    else:
+        stamps = [get_ref_stamp(x) for x in repo_dirs]
+        statuses = map_repos(status_worker, repo_dirs, jobs)
+        update_repo_state(
+            top_dir,
+            {
+                x.name: {'dir': x.name, 'head': x.head, 'branch': x.branch, 'stamp': y}
+                for x, y in zip(statuses, stamps)
+            },
+        )
+    log_repo_status(statuses)
+
+
+def log_repo_status(statuses):
+    """
+    Display repository status, ie, from ``get_repo_status``.
+
+    :param statuses: list of status mappings
+    :type statuses: list
+    """
+    for status in statuses:
         logging.info(
             'Repository %s: branch is %s, commit is %s',
-            str(git_dir),
-            item2_data,
-            item1_data,
+            status['name'],
+            status['branch'],
+            status['describe'],
         )
-        os.chdir(top_dir)
-    os.chdir(work_dir)
+        if status['ahead'] or status['behind']:
+            logging.info(
+                'Repository %s: %d ahead, %d behind %s',
+                status['name'],
+                status['ahead'],
+                status['behind'],
+                status['upstream'],
+            )
 
 
 def main(argv=None):  # pragma: no cover
@@ -531,13 +2202,18 @@ def main(argv=None):  # pragma: no cover
     if argv is None:
         argv = sys.argv
 
-    __version__ = version('repolite')
+    import argparse
 
     parser = argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
         description='Manage local (git) dependencies (default: clone and checkout)',
     )
-    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    parser.add_argument(
+        "--version",
+        action="store_true",
+        default=argparse.SUPPRESS,
+        help="show program's version number and exit",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -550,6 +2226,14 @@ def main(argv=None):  # pragma: no cover
         action="store_true",
         help="Suppress output from git command",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Number of repositories to process in parallel",
+    )
     parser.add_argument(
         '-D',
         '--dump-config',
@@ -576,6 +2260,13 @@ def main(argv=None):  # pragma: no cover
         action="store_true",
         help="Update existing/enabled repositories",
     )
+    parser.add_argument(
+        "-k",
+        "--skip-unchanged",
+        action="store_true",
+        dest="probe",
+        help="With --update, skip repositories already at the remote branch tip",
+    )
     parser.add_argument(
         "-s",
         "--show",
@@ -602,6 +2293,106 @@ def main(argv=None):  # pragma: no cover
         dest="lock",
         help='Lock active configuration in new config file and checkout hashes',
     )
+    parser.add_argument(
+        '-L',
+        '--lock-remote',
+        action='store_true',
+        dest="lock_remote",
+        help='Lock active configuration using remote branch hashes (no clone needed)',
+    )
+    parser.add_argument(
+        '--has-tag',
+        metavar='TAG',
+        dest="has_tag",
+        help='Check if TAG exists in all enabled repositories (exit 1 if not)',
+    )
+    parser.add_argument(
+        '--check-state',
+        action='store_true',
+        dest="check_state",
+        help='Check if the top_dir directories match the config (exit 1 if not)',
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Serve show/lock/tag/state queries on a unix socket until interrupted',
+    )
+    parser.add_argument(
+        '--no-daemon',
+        action='store_true',
+        dest="no_daemon",
+        help='Do not use a running daemon (always run queries locally)',
+    )
+    parser.add_argument(
+        '-w',
+        '--watch',
+        action='store_true',
+        help='Keep repository state current until interrupted (Linux inotify)',
+    )
+    parser.add_argument(
+        '-O',
+        '--optimize',
+        action='store_true',
+        help='Write commit-graphs, pack loose objects, and combine packs',
+    )
+    parser.add_argument(
+        '--export-bundles',
+        metavar='DIR',
+        dest="export_dir",
+        help='Write a git bundle for each enabled repository to DIR and exit',
+    )
+    parser.add_argument(
+        '--seed-bundles',
+        metavar='DIR',
+        dest="bundle_dir",
+        help='Seed new clones from git bundles in DIR (then fetch if reachable)',
+    )
+    parser.add_argument(
+        '--ssh-mux',
+        action='store_true',
+        dest="ssh_mux",
+        help='Share one ssh connection per remote host for all git network cmds',
+    )
+    parser.add_argument(
+        '--only',
+        metavar='NAME',
+        action='append',
+        dest="only_names",
+        help='Only process the named repository (name or alias, repeatable)',
+    )
+    parser.add_argument(
+        '--group',
+        metavar='GROUP',
+        action='append',
+        dest="groups",
+        help='Only process repositories in GROUP (see repo_groups, repeatable)',
+    )
+    parser.add_argument(
+        '--match',
+        metavar='REGEX',
+        dest="pattern",
+        help='Only process repositories with a name or alias matching REGEX',
+    )
+    parser.add_argument(
+        '--format',
+        choices=OUTPUT_FORMATS,
+        default='text',
+        dest="out_format",
+        help='Result format; ndjson writes one JSON line per repository to stdout',
+    )
+    parser.add_argument(
+        '--trace',
+        metavar='FILE',
+        dest="trace_file",
+        help='Write a Chrome trace-event JSON file with the timing of each command',
+    )
+    parser.add_argument(
+        '--trace-top',
+        metavar='N',
+        type=int,
+        default=10,
+        help='Number of slowest commands to show in the --trace summary',
+    )
     parser.add_argument(
         "tag",
         metavar="TAG",
@@ -611,58 +2402,157 @@ def main(argv=None):  # pragma: no cover
     )
 
     opts = parser.parse_args()
+    if getattr(opts, 'version', False):
+        from . import __version__
+
+        print(f'{parser.prog} {__version__}')
+        sys.exit(0)
 
     # basic logging setup must come before any other logging calls
     log_level = logging.DEBUG if opts.verbose else logging.INFO
-    logging.basicConfig(stream=sys.stdout, level=log_level)
+    set_output_format(opts.out_format)
+    log_stream = sys.stderr if is_streaming() else sys.stdout
+    logging.basicConfig(stream=log_stream, level=log_level)
     # printout()  # logging_tree
 
-    cfg, pfile = load_config()
+    if opts.trace_file:
+        start_trace()
+        atexit.register(finish_trace, opts.trace_file, opts.trace_top)
+
+    # these only need the config file path (no parsing or git)
+    if opts.save or opts.dump:
+        pfile = get_config_file()
+        if opts.save:
+            Path('.repolite.yml').write_bytes(pfile.read_bytes())
+        else:
+            sys.stdout.write(pfile.read_text(encoding='utf-8'))
+            sys.stdout.flush()
+        sys.exit(0)
+
+    if not opts.no_daemon and not (opts.changelog or opts.install or opts.daemon):
+        exit_code = run_daemon_query(opts)
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    try:
+        cfg, pfile = load_config()
+        select_repos(cfg.repos, opts.only_names, opts.groups, opts.pattern)
+    except RepoSpecError as exc:
+        logging.error('Config: %s', exc)
+        sys.exit(1)
     flag_list, repo_list = parse_config(cfg)
 
     git_cmd, lfs_cmd = check_for_git()
     logging.debug('Found at least one git binary: %s and %s', git_cmd, lfs_cmd)
     flag_list.append(lfs_cmd)
 
-    if opts.save:
-        cfg_data = pfile.read_bytes()
-        def_config = Path('.repolite.yml')
-        def_config.write_bytes(cfg_data)
-        sys.exit(0)
-    if opts.dump:
-        sys.stdout.write(pfile.read_text(encoding='utf-8'))
-        sys.stdout.flush()
-        sys.exit(0)
+    local_only = (
+        opts.changelog
+        or opts.install
+        or opts.show
+        or opts.lock
+        or opts.export_dir
+        or opts.optimize
+        or opts.watch
+        or opts.has_tag
+        or opts.check_state
+        or opts.daemon
+    )
+    if opts.ssh_mux and not local_only:
+        from .sshmux import SshMux
+
+        ssh_mux = SshMux([x.repo_url for x in repo_list])
+        atexit.register(ssh_mux.stop)
+        ssh_mux.start()
 
     try:
         if opts.changelog:
-            process_repo_changes(cfg)
+            process_repo_changes(cfg, opts.jobs)
             sys.exit(0)
         if opts.install:
             process_repo_install(cfg, opts.quiet)
             sys.exit(0)
         if opts.show:
-            show_repo_state(cfg)
+            show_repo_state(cfg, opts.jobs)
             sys.exit(0)
+        if opts.has_tag:
+            has_tag = check_repo_tags(cfg, opts.has_tag)
+            sys.exit(0 if all(has_tag.values()) else 1)
+        if opts.check_state:
+            valid_repo_state = check_repo_state(cfg)
+            emit_result('check', resolve_top_dir(cfg.top_dir)[1], valid=valid_repo_state)
+            sys.exit(0 if valid_repo_state else 1)
         if opts.lock:
             create_locked_cfg(cfg, pfile, opts.quiet)
             sys.exit(0)
+        if opts.daemon:
+            import signal
+
+            from .daemon import RepoDaemon
+
+            signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+            try:
+                RepoDaemon(pfile, jobs=opts.jobs).serve()
+            except KeyboardInterrupt:
+                pass
+            except OSError as exc:
+                logging.error('Daemon: %s', exc)
+                sys.exit(1)
+            sys.exit(0)
+        if opts.watch:
+            import signal
+
+            signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+            try:
+                watch_repo_state(cfg, opts.jobs)
+            except KeyboardInterrupt:
+                pass
+            except OSError as exc:
+                logging.error('Watch: %s', exc)
+                sys.exit(1)
+            sys.exit(0)
+        if opts.lock_remote:
+            create_remote_locked_cfg(cfg, pfile, opts.jobs)
+            sys.exit(0)
+        if opts.optimize:
+            optimize_repos(cfg, opts.quiet, opts.jobs)
+            sys.exit(0)
+        if opts.export_dir:
+            export_repo_bundles(cfg, opts.export_dir, opts.quiet, opts.jobs)
+            sys.exit(0)
         if opts.apply:
             new_tag = opts.tag if opts.tag else None
-            create_repo_tags(cfg, new_tag)
+            create_repo_tags(cfg, new_tag, jobs=opts.jobs)
             sys.exit(0)
     except DirectoryTypeError as exc:
         logging.error('Top dir: %s', exc)
         sys.exit(1)
+    except RepoProcessError as exc:
+        logging.error('Repositories: %s', exc)
+        sys.exit(1)
 
     ulock = 'locked' in pfile.name
     flag_list.append(ulock)
 
     try:
-        process_git_repos(flag_list, repo_list, opts.update, opts.quiet)
+        process_git_repos(
+            flag_list,
+            repo_list,
+            opts.update,
+            opts.quiet,
+            opts.jobs,
+            opts.probe,
+            opts.bundle_dir,
+        )
     except FileExistsError as exc:
         logging.error('Top dir: %s', exc)
         logging.error('Did you sync your repositories first?')
+    except RepoProcessError as exc:
+        logging.error('Sync: %s', exc)
+        sys.exit(1)
+    except ValueError as exc:
+        logging.error('Config: %s', exc)
+        sys.exit(1)
 
 
 if __name__ == '__main__':
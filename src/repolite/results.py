@@ -0,0 +1,63 @@
+# Copyright 2022 Stephen L Arnold
+#
+# This is free software, licensed under the LGPL-2.1 license
+# available in the accompanying LICENSE file.
+
+"""
+Machine-readable result output. With the ``ndjson`` format, each command
+emits one JSON object per repository (one line each) on stdout as soon as
+that repository is done, while log messages and git output go to stderr.
+With the default ``text`` format, nothing is emitted here.
+"""
+
+import json
+import sys
+import threading
+import time
+
+OUTPUT_FORMATS = ['text', 'ndjson']
+
+_LOCK = threading.Lock()
+_FORMAT = 'text'
+
+
+def set_output_format(fmt):
+    """
+    Set the result output format.
+
+    :param fmt: output format, ie, one of ``OUTPUT_FORMATS``
+    :type fmt: str
+    :raises ValueError: if the format is not supported
+    """
+    global _FORMAT  # pylint: disable=global-statement
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f'Unsupported output format: {fmt}')
+    _FORMAT = fmt
+
+
+def is_streaming():
+    """
+    Return ``True`` if results are emitted as NDJSON, ie, stdout is reserved
+    for result lines.
+    """
+    return _FORMAT == 'ndjson'
+
+
+def emit_result(command, repo, **data):
+    """
+    Emit a result line for one repository (NDJSON format only). Safe to
+    call from worker threads.
+
+    :param command: command name, eg, ``show`` or ``update``
+    :type command: str
+    :param repo: repository (directory) name
+    :type repo: str
+    :param data: result data (must be JSON serializable or str-able)
+    """
+    if _FORMAT != 'ndjson':
+        return
+    result = {'command': command, 'repo': str(repo), 'time': time.time(), **data}
+    line = json.dumps(result, sort_keys=True, default=str)
+    with _LOCK:
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
@@ -0,0 +1,290 @@
+# Copyright 2022 Stephen L Arnold
+#
+# This is free software, licensed under the LGPL-2.1 license
+# available in the accompanying LICENSE file.
+
+"""
+Repository spec with defaults and validation. Config files only need the
+keys that differ from the defaults below; the whole manifest is validated
+once when the config is loaded, before any git command runs.
+"""
+
+import re
+from copy import copy
+
+REQUIRED = object()
+
+# key: (default value, allowed types)
+REPO_FIELDS = {
+    'repo_name': (REQUIRED, (str,)),
+    'repo_alias': (None, (str, type(None))),
+    'repo_url': (REQUIRED, (str,)),
+    'repo_depth': (0, (int,)),
+    'repo_remote': ('origin', (str,)),
+    'repo_opts': ([], (list,)),
+    'repo_branch': (REQUIRED, (str,)),
+    'repo_hash': (None, (str, type(None))),
+    'repo_create_tag_msg': ('new tag', (str,)),
+    'repo_create_tag_new': (None, (str, type(None))),
+    'repo_create_tag_annotated': (False, (bool,)),
+    'repo_create_tag_signed': (False, (bool,)),
+    'repo_push_new_tags': (False, (bool,)),
+    'repo_signing_key': (None, (str, type(None))),
+    'repo_changelog_ext': ('rst', (str,)),
+    'repo_changelog_base': (None, (str, type(None))),
+    'repo_gen_changes': (False, (bool,)),
+    'repo_use_rebase': (False, (bool,)),
+    'repo_has_lfs_files': (False, (bool,)),
+    'repo_init_submodules': (False, (bool,)),
+    'repo_install': (False, (bool,)),
+    'repo_enable': (True, (bool,)),
+    'repo_groups': ([], (list,)),
+}
+
+# global keys: (default value, allowed types)
+CFG_FIELDS = {
+    'prog_name': ('repolite', (str,)),
+    'top_dir': ('ext', (str,)),
+    'pull_with_rebase': (False, (bool,)),
+    'repos': (REQUIRED, (list,)),
+}
+
+
+class RepoSpecError(ValueError):
+    """Raise when the config file has invalid or unknown keys/values"""
+
+    __module__ = Exception.__module__
+
+
+class RepoSpec:
+    """
+    Settings for one repository, ie, one ``repos`` entry in the config
+    file with defaults applied for any missing keys.
+    """
+
+    # ``selected`` is runtime state (cmd line selectors), not a config key
+    __slots__ = tuple(REPO_FIELDS) + ('selected',)
+
+    def __init__(self, **kwargs):
+        for key, (default, _) in REPO_FIELDS.items():
+            value = kwargs.get(key, default)
+            setattr(self, key, None if value is REQUIRED else copy(value))
+        self.selected = True
+
+    def __eq__(self, other):
+        if not isinstance(other, RepoSpec):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f'RepoSpec({self.to_dict(compact=True)!r})'
+
+    @property
+    def dir_name(self):
+        """Repository directory name, ie, the alias if set, else the name"""
+        return self.repo_alias if self.repo_alias else self.repo_name
+
+    @classmethod
+    def from_dict(cls, data, label='repo'):
+        """
+        Create a validated spec from a config ``repos`` entry.
+
+        :param data: repository settings
+        :type data: dict
+        :param label: label for error messages, eg, ``repos[3]``
+        :type label: str
+        :return spec: new repository spec
+        :rtype: RepoSpec
+        :raises RepoSpecError: with all problems found in this entry
+        """
+        if isinstance(data, dict):
+            data = {k: coerce_str(k, v) for k, v in data.items()}
+        errors = check_fields(data, REPO_FIELDS, label)
+        if not errors:
+            errors = [f'{label}: {x}' for x in check_repo_values(data)]
+        if errors:
+            raise RepoSpecError('; '.join(errors))
+        return cls(**data)
+
+    def to_dict(self, compact=False):
+        """
+        Return the settings as a plain dict.
+
+        :param compact: only include keys that differ from the defaults
+        :type compact: bool
+        :return data: repository settings
+        :rtype: dict
+        """
+        data = {}
+        for key, (default, _) in REPO_FIELDS.items():
+            value = getattr(self, key)
+            if not compact or default is REQUIRED or value != default:
+                data[key] = copy(value)
+        return data
+
+
+def coerce_str(key, value):
+    """
+    Convert YAML numbers to strings for string keys, eg, an unquoted tag or
+    branch name like ``1.1``.
+
+    :param key: repository key
+    :type key: str
+    :param value: config value
+    :return value: string for numeric values of string keys, else value
+    """
+    types = REPO_FIELDS.get(key, (None, ()))[1]
+    if str in types and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+def check_fields(data, fields, label):
+    """
+    Check a config mapping for unknown keys, missing required keys, and
+    value types.
+
+    :param data: config mapping
+    :type data: dict
+    :param fields: field table, ie, key: (default, types)
+    :type fields: dict
+    :param label: label for error messages
+    :type label: str
+    :return errors: list of error strings
+    :rtype: list
+    """
+    if not isinstance(data, dict):
+        return [f'{label}: expected a mapping, got {type(data).__name__}']
+    errors = [f'{label}: unknown key {x!r}' for x in data if x not in fields]
+    for key, (default, types) in fields.items():
+        if key not in data:
+            if default is REQUIRED:
+                errors.append(f'{label}: missing required key {key!r}')
+            continue
+        value = data[key]
+        # bool is a subclass of int
+        bad_bool = isinstance(value, bool) and bool not in types
+        if bad_bool or not isinstance(value, types):
+            expected = '/'.join('null' if x is type(None) else x.__name__ for x in types)
+            errors.append(f'{label}: {key} must be {expected}, got {value!r}')
+    return errors
+
+
+def check_repo_values(data):
+    """
+    Check repository values beyond their types.
+
+    :param data: repository settings (with valid types)
+    :type data: dict
+    :return errors: list of error strings
+    :rtype: list
+    """
+    errors = []
+    if data.get('repo_depth', 0) < 0:
+        errors.append('repo_depth must not be negative')
+    if not all(isinstance(x, str) for x in data.get('repo_opts', [])):
+        errors.append('repo_opts must be a list of strings')
+    if not all(isinstance(x, str) for x in data.get('repo_groups', [])):
+        errors.append('repo_groups must be a list of strings')
+    if data.get('repo_changelog_ext', 'rst') not in ('rst', 'md'):
+        errors.append('repo_changelog_ext must be rst or md')
+    return errors
+
+
+def build_config(cfg_data):
+    """
+    Validate a parsed config file and apply defaults, ie, replace each
+    ``repos`` entry with a ``RepoSpec``. All problems are collected and
+    reported together.
+
+    :param cfg_data: parsed config data
+    :type cfg_data: dict
+    :return cfg_data: new config data with global defaults and repo specs
+    :rtype: dict
+    :raises RepoSpecError: if the config is not valid
+    """
+    errors = check_fields(cfg_data, CFG_FIELDS, 'config')
+    if errors:
+        raise RepoSpecError('; '.join(errors))
+    specs = []
+    dir_names = {}
+    for idx, item in enumerate(cfg_data['repos']):
+        name = item.get('repo_name') if isinstance(item, dict) else None
+        label = f'repos[{idx}] ({name})' if name else f'repos[{idx}]'
+        try:
+            spec = RepoSpec.from_dict(item, label)
+        except RepoSpecError as exc:
+            errors.append(str(exc))
+            continue
+        if spec.dir_name in dir_names:
+            errors.append(f'{label}: duplicate directory name {spec.dir_name!r}')
+        dir_names[spec.dir_name] = idx
+        specs.append(spec)
+    if errors:
+        raise RepoSpecError('; '.join(errors))
+    data = {key: cfg_data.get(key, default) for key, (default, _) in CFG_FIELDS.items()}
+    data['repos'] = specs
+    return data
+
+
+def select_repos(repos, names=None, groups=None, pattern=None):
+    """
+    Mark the repositories selected by any of the given names (``repo_name``
+    or ``repo_alias``), groups (``repo_groups``), or regex pattern (searched
+    in name and alias). All repositories are selected if no selectors are
+    given.
+
+    :param repos: repository specs
+    :type repos: list
+    :param names: repository names
+    :type names: list or None
+    :param groups: group names
+    :type groups: list or None
+    :param pattern: regular expression
+    :type pattern: str or None
+    :return selected: list of selected repository specs
+    :rtype: list
+    :raises RepoSpecError: if a name or group is unknown, the pattern is
+                           not valid, or nothing is selected
+    """
+    names = set(names or [])
+    groups = set(groups or [])
+    try:
+        regex = re.compile(pattern) if pattern else None
+    except re.error as exc:
+        raise RepoSpecError(f'invalid --match pattern {pattern!r}: {exc}') from exc
+
+    all_names = {x.repo_name for x in repos} | {
+        x.repo_alias for x in repos if x.repo_alias
+    }
+    all_groups = {g for x in repos for g in x.repo_groups}
+    errors = [f'unknown repository {x!r}' for x in sorted(names - all_names)]
+    errors += [f'unknown group {x!r}' for x in sorted(groups - all_groups)]
+    if errors:
+        raise RepoSpecError('; '.join(errors))
+
+    use_all = not (names or groups or regex)
+    for item in repos:
+        item_names = {item.repo_name, item.dir_name}
+        item.selected = (
+            use_all
+            or bool(item_names & names)
+            or bool(groups.intersection(item.repo_groups))
+            or (regex is not None and any(regex.search(x) for x in item_names))
+        )
+    selected = [x for x in repos if x.selected]
+    if not selected:
+        raise RepoSpecError('no repositories match the given selectors')
+    return selected
+
+
+def enabled_repos(repos):
+    """
+    Get the enabled repositories that are also selected (see ``select_repos``).
+
+    :param repos: repository objs
+    :type repos: list
+    :return repos: list of enabled, selected repository objs
+    :rtype: list
+    """
+    return [x for x in repos if x.repo_enable and getattr(x, 'selected', True)]
@@ -0,0 +1,159 @@
+# Copyright 2022 Stephen L Arnold
+#
+# This is free software, licensed under the LGPL-2.1 license
+# available in the accompanying LICENSE file.
+
+"""
+Shared (multiplexed) ssh connections for git remotes. Repositories are
+grouped by remote host and one ssh control master is started per host, so
+every clone, fetch, pull, and push over ssh reuses an open connection
+instead of doing a full handshake. Git is pointed at the control sockets
+via ``GIT_SSH_COMMAND``; if a master cannot be started, ssh falls back to
+a normal connection for that host.
+"""
+
+import logging
+import os
+import re
+import subprocess as sp
+import tempfile
+import time
+from pathlib import Path
+from shlex import quote, split
+from shutil import rmtree
+
+SCP_URL_RE = re.compile(r'^(?:(?P<user>[^@/]+)@)?(?P<host>[^:/]+):(?!//)')
+SSH_URL_RE = re.compile(
+    r'^(?:git\+)?ssh://(?:(?P<user>[^@/]+)@)?(?P<host>[^:/]+)(?::(?P<port>\d+))?/'
+)
+MUX_TIMEOUT = 15
+
+
+def get_ssh_host(url):
+    """
+    Get the ssh destination for a git remote URL, ie, ``ssh://`` URLs and
+    scp-style ``user@host:path`` URLs.
+
+    :param url: git remote URL
+    :type url: str
+    :return host: tuple of (user, host, port) or None if not an ssh URL
+    :rtype: tuple or None
+    """
+    url = str(url)
+    match = SSH_URL_RE.match(url)
+    if match:
+        return match.group('user'), match.group('host'), match.group('port')
+    if '://' in url or Path(url).exists():
+        return None
+    match = SCP_URL_RE.match(url)
+    if match:
+        return match.group('user'), match.group('host'), None
+    return None
+
+
+class SshMux:
+    """
+    Start and stop ssh control masters for a set of git remote URLs.
+
+    :param urls: git remote URLs (non-ssh URLs are ignored)
+    :type urls: list
+    :param ssh_cmd: ssh command (default is ``$GIT_SSH_COMMAND`` or ssh)
+    :type ssh_cmd: str or None
+    :param timeout: seconds to wait for each master connection
+    :type timeout: int
+    """
+
+    def __init__(self, urls, ssh_cmd=None, timeout=MUX_TIMEOUT):
+        hosts = {get_ssh_host(x) for x in urls}
+        hosts.discard(None)
+        self.hosts = sorted(hosts, key=str)
+        self.ssh_cmd = ssh_cmd or os.environ.get('GIT_SSH_COMMAND', 'ssh')
+        self.timeout = timeout
+        self.sock_dir = None
+        self.masters = {}
+        self.saved_env = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _ssh_args(self, host, *opts):
+        user, hostname, port = host
+        args = split(self.ssh_cmd) + ['-o', f'ControlPath={self.sock_dir}/%C']
+        args += list(opts)
+        if port:
+            args += ['-p', port]
+        args.append(f'{user}@{hostname}' if user else hostname)
+        return args
+
+    def _check(self, host):
+        cmd = self._ssh_args(host, '-O', 'check')
+        return (
+            sp.run(cmd, stdout=sp.DEVNULL, stderr=sp.DEVNULL, check=False).returncode == 0
+        )
+
+    def start(self):
+        """
+        Start one control master per host (in parallel) and point git at the
+        control sockets.
+        """
+        if not self.hosts:
+            return
+        self.sock_dir = tempfile.mkdtemp(prefix='repolite-ssh-')
+        for host in self.hosts:
+            cmd = self._ssh_args(
+                host,
+                '-o',
+                'ControlMaster=yes',
+                '-o',
+                'ControlPersist=no',
+                '-o',
+                'BatchMode=yes',
+                '-N',
+            )
+            logging.debug('Starting ssh master: %s', cmd)
+            self.masters[host] = sp.Popen(cmd, stdin=sp.DEVNULL, stdout=sp.DEVNULL)
+
+        deadline = time.monotonic() + self.timeout
+        for host, proc in self.masters.items():
+            while proc.poll() is None and not self._check(host):
+                if time.monotonic() > deadline:
+                    break
+                time.sleep(0.05)
+            if self._check(host):
+                logging.info('Using shared ssh connection for %s', host[1])
+            else:
+                logging.warning('No shared ssh connection for %s', host[1])
+
+        self.saved_env = os.environ.get('GIT_SSH_COMMAND')
+        os.environ['GIT_SSH_COMMAND'] = (
+            f'{self.ssh_cmd} -o ControlMaster=no '
+            f'-o ControlPath={quote(self.sock_dir)}/%C'
+        )
+
+    def stop(self):
+        """
+        Stop all control masters, restore ``GIT_SSH_COMMAND``, and remove
+        the socket directory.
+        """
+        if self.sock_dir is None:
+            return
+        if self.saved_env is None:
+            os.environ.pop('GIT_SSH_COMMAND', None)
+        else:
+            os.environ['GIT_SSH_COMMAND'] = self.saved_env
+        for host, proc in self.masters.items():
+            if proc.poll() is None:
+                cmd = self._ssh_args(host, '-O', 'exit')
+                sp.run(cmd, stdout=sp.DEVNULL, stderr=sp.DEVNULL, check=False)
+            try:
+                proc.wait(timeout=5)
+            except sp.TimeoutExpired:
+                proc.terminate()
+                proc.wait()
+        self.masters = {}
+        rmtree(self.sock_dir, ignore_errors=True)
+        self.sock_dir = None
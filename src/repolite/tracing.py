@@ -0,0 +1,239 @@
+# Copyright 2022 Stephen L Arnold
+#
+# This is free software, licensed under the LGPL-2.1 license
+# available in the accompanying LICENSE file.
+
+"""
+Command execution hook with optional timing trace. All external commands
+(git, pip, gitchangelog) should be run via ``run_traced`` so that, when a
+trace is active, each command is recorded with its repository name, start
+and end times, and exit status. The trace can be written as a Chrome
+trace-event JSON file (load it in ``chrome://tracing`` or Perfetto).
+"""
+
+import json
+import logging
+import os
+import subprocess as sp
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from .results import is_streaming
+
+_CONTEXT = threading.local()
+_TRACER = None
+
+
+class CmdTracer:
+    """
+    Collect timing events for external commands (thread-safe).
+    """
+
+    def __init__(self):
+        self.events = []
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def record(self, repo, step, cmd, start, end, status):
+        """
+        Record a finished command.
+
+        :param repo: repository name
+        :type repo: str
+        :param step: short step name, eg, ``git fetch``
+        :type step: str
+        :param cmd: full command
+        :type cmd: str
+        :param start: start time from ``time.perf_counter``
+        :type start: float
+        :param end: end time from ``time.perf_counter``
+        :type end: float
+        :param status: command exit status
+        :type status: int
+        """
+        event = {
+            'repo': repo,
+            'step': step,
+            'cmd': cmd,
+            'start': start - self.origin,
+            'duration': end - start,
+            'status': status,
+            'thread': threading.get_ident(),
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def slowest(self, count=10):
+        """
+        Return the slowest recorded commands.
+
+        :param count: number of events to return
+        :type count: int
+        :return events: list of event dicts, slowest first
+        :rtype: list
+        """
+        with self.lock:
+            events = list(self.events)
+        return sorted(events, key=lambda x: x['duration'], reverse=True)[:count]
+
+    def to_chrome(self):
+        """
+        Convert recorded events to Chrome trace-event format, ie, complete
+        (``X``) events with microsecond timestamps, one track per thread.
+
+        :return data: trace-event data
+        :rtype: dict
+        """
+        with self.lock:
+            events = list(self.events)
+        threads = {}
+        trace_events = []
+        for event in events:
+            tid = threads.setdefault(event['thread'], len(threads) + 1)
+            trace_events.append(
+                {
+                    'name': f"{event['repo']}: {event['step']}",
+                    'cat': event['step'].split()[0],
+                    'ph': 'X',
+                    'ts': round(event['start'] * 1e6),
+                    'dur': round(event['duration'] * 1e6),
+                    'pid': os.getpid(),
+                    'tid': tid,
+                    'args': {
+                        'repo': event['repo'],
+                        'cmd': event['cmd'],
+                        'status': event['status'],
+                    },
+                }
+            )
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def write(self, trace_file):
+        """
+        Write the Chrome trace-event JSON file.
+
+        :param trace_file: output file path
+        :type trace_file: Path or str
+        """
+        Path(trace_file).write_text(json.dumps(self.to_chrome()), encoding='utf-8')
+        logging.info('Trace file: %s', trace_file)
+
+
+def get_tracer():
+    """
+    Return the active tracer (None if tracing is not enabled).
+    """
+    return _TRACER
+
+
+def start_trace():
+    """
+    Enable tracing and return the new (active) tracer.
+
+    :return tracer: active tracer
+    :rtype: CmdTracer
+    """
+    global _TRACER  # pylint: disable=global-statement
+    _TRACER = CmdTracer()
+    return _TRACER
+
+
+def stop_trace():
+    """
+    Disable tracing and return the last active tracer.
+
+    :return tracer: last active tracer or None
+    :rtype: CmdTracer or None
+    """
+    global _TRACER  # pylint: disable=global-statement
+    tracer, _TRACER = _TRACER, None
+    return tracer
+
+
+@contextmanager
+def trace_repo(name):
+    """
+    Context manager to set the repository name for commands run in the
+    current thread.
+
+    :param name: repository (directory) name
+    :type name: str
+    """
+    prev = getattr(_CONTEXT, 'repo', None)
+    _CONTEXT.repo = name
+    try:
+        yield
+    finally:
+        _CONTEXT.repo = prev
+
+
+def get_step_name(cmd):
+    """
+    Get a short step name from a command, eg, ``git fetch`` or ``pip install``.
+
+    :param cmd: command args
+    :type cmd: list
+    :return step: step name
+    :rtype: str
+    """
+    args = [str(x) for x in cmd]
+    prog = Path(args[0]).name if args else ''
+    if prog == 'git':
+        idx = 1
+        while idx < len(args) and args[idx].startswith('-'):
+            # skip global options, including the value for -C and -c
+            idx += 2 if args[idx] in ('-C', '-c') else 1
+        return f'git {args[idx]}' if idx < len(args) else 'git'
+    if len(args) > 3 and args[1:3] == ['-m', 'pip']:
+        return f'pip {args[3]}'
+    return prog
+
+
+def run_traced(func, cmd, **kwargs):
+    """
+    Run a command using a ``subprocess`` function (eg, ``check_call``) and
+    record it in the active trace, if any. When results are streamed as
+    NDJSON, command output is sent to stderr instead of stdout.
+
+    :param func: subprocess function, ie, check_call, check_output, or run
+    :type func: function
+    :param cmd: command args
+    :type cmd: list
+    :return: result of ``func``
+    :raises CalledProcessError: if ``func`` does
+    """
+    if is_streaming() and func is not sp.check_output and 'stdout' not in kwargs:
+        # keep stdout for result lines
+        if not kwargs.get('capture_output'):
+            kwargs['stdout'] = sys.stderr
+    tracer = _TRACER
+    if tracer is None:
+        return func(cmd, **kwargs)
+    repo = getattr(_CONTEXT, 'repo', None)
+    if repo is None:
+        repo = Path(kwargs.get('cwd') or Path.cwd()).name
+    status = 0
+    start = time.perf_counter()
+    try:
+        result = func(cmd, **kwargs)
+        if isinstance(result, sp.CompletedProcess):
+            status = result.returncode
+        return result
+    except sp.CalledProcessError as exc:
+        status = exc.returncode
+        raise
+    except OSError:
+        status = -1
+        raise
+    finally:
+        tracer.record(
+            repo,
+            get_step_name(cmd),
+            ' '.join(str(x) for x in cmd),
+            start,
+            time.perf_counter(),
+            status,
+        )
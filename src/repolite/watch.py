@@ -0,0 +1,289 @@
+# Copyright 2022 Stephen L Arnold
+#
+# This is free software, licensed under the LGPL-2.1 license
+# available in the accompanying LICENSE file.
+
+"""
+Linux inotify watcher for the repositories in ``top_dir``. Each git
+directory is watched for changes to ``HEAD``, ``index``, and
+``packed-refs``, and the whole ``refs`` tree for loose ref updates. Events
+are debounced per repository, so a burst of ref updates (eg, a large
+fetch) results in a single refresh once the repository has been quiet
+for a short time.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+from .gitrefs import find_git_dir, get_common_dir
+
+WATCH_DEBOUNCE = 0.5
+WATCH_MAX_DELAY = 5.0
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+EVENT_HEADER = struct.Struct('iIII')
+GIT_DIR_FILES = ('HEAD', 'index', 'packed-refs')
+
+
+class Inotify:
+    """
+    Minimal ctypes wrapper for the Linux inotify API.
+
+    :raises OSError: if inotify is not available
+    """
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c')
+        try:
+            self.libc = ctypes.CDLL(libc_name, use_errno=True)
+            init = self.libc.inotify_init1
+        except (OSError, AttributeError) as exc:
+            raise OSError('inotify is not available on this platform') from exc
+        self.fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f'inotify_init1: {os.strerror(errno)}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        """
+        Add (or update) a watch for a path.
+
+        :param path: file or directory path
+        :type path: Path or str
+        :param mask: inotify event mask
+        :type mask: int
+        :return wd: watch descriptor
+        :rtype: int
+        :raises OSError: if the watch cannot be added
+        """
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(str(path)), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f'inotify_add_watch: {os.strerror(errno)}', str(path))
+        return wd
+
+    def read(self, timeout=None):
+        """
+        Wait for events and return them.
+
+        :param timeout: seconds to wait (None means wait forever)
+        :type timeout: float or None
+        :return events: list of (wd, mask, name) tuples
+        :rtype: list
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            end = offset + name_len
+            name = data[offset:end].rstrip(b'\0')
+            offset = end
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        """
+        Close the inotify file descriptor (this removes all watches).
+        """
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class RepoWatcher:
+    """
+    Watch the git metadata of repositories in ``top_dir`` and report which
+    repositories need a refresh.
+
+    :param top_dir: top-level repository directory
+    :type top_dir: Path obj
+    :param dir_names: repository directory names
+    :type dir_names: list
+    :param debounce: seconds a repository must be quiet before a refresh
+    :type debounce: float
+    :param max_delay: max seconds to delay a refresh during constant changes
+    :type max_delay: float
+    """
+
+    def __init__(
+        self, top_dir, dir_names, debounce=WATCH_DEBOUNCE, max_delay=WATCH_MAX_DELAY
+    ):
+        self.top_dir = Path(top_dir)
+        self.dir_names = list(dir_names)
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.inotify = None
+        self.watches = {}
+        self.pending = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _add_tree(self, name, path, git_dir=False):
+        for dir_path in [path] + ([] if git_dir else sorted(path.rglob('*'))):
+            if not dir_path.is_dir():
+                continue
+            try:
+                wd = self.inotify.add_watch(dir_path)
+            except OSError as exc:
+                logging.warning('Cannot watch %s: %s', dir_path, exc)
+                continue
+            self.watches[wd] = (name, dir_path, git_dir)
+
+    def start(self):
+        """
+        Start watching each repository's git directory and refs tree.
+
+        :raises OSError: if inotify is not available
+        """
+        self.inotify = Inotify()
+        for name in self.dir_names:
+            git_dir = find_git_dir(self.top_dir / name)
+            if git_dir is None:
+                logging.warning('Cannot watch %s: git directory not found', name)
+                continue
+            common_dir = get_common_dir(git_dir)
+            self._add_tree(name, git_dir, git_dir=True)
+            if common_dir != git_dir:
+                self._add_tree(name, common_dir, git_dir=True)
+            self._add_tree(name, common_dir / 'refs')
+        logging.debug('Watching %d directories', len(self.watches))
+
+    def stop(self):
+        """
+        Stop watching.
+        """
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+        self.watches = {}
+        self.pending = {}
+
+    def handle_event(self, wd, mask, name):
+        """
+        Map an inotify event to the repositories that changed.
+
+        :param wd: watch descriptor
+        :type wd: int
+        :param mask: event mask
+        :type mask: int
+        :param name: file name (relative to the watched directory)
+        :type name: str
+        :return dir_names: repository names, or None for unrelated events
+        :rtype: list or None
+        """
+        if mask & IN_Q_OVERFLOW:
+            # events were lost, so refresh everything
+            return list(self.dir_names)
+        if wd not in self.watches:
+            return None
+        repo, dir_path, git_dir = self.watches[wd]
+        if mask & IN_IGNORED:
+            del self.watches[wd]
+            return None
+        if git_dir:
+            return [repo] if name in GIT_DIR_FILES else None
+        if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+            # new ref namespace, eg, refs/remotes/origin/feature/
+            self._add_tree(repo, dir_path / name)
+        if name.endswith('.lock'):
+            return None
+        return [repo]
+
+    def poll(self, timeout=None):
+        """
+        Wait for events and return the repositories that are due for a
+        refresh, ie, quiet for ``debounce`` seconds, or changing for more
+        than ``max_delay`` seconds.
+
+        :param timeout: max seconds to wait (None means until one is due)
+        :type timeout: float or None
+        :return dir_names: sorted list of repository names to refresh
+        :rtype: list
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            due = sorted(
+                name
+                for name, (first, last) in self.pending.items()
+                if now - last >= self.debounce or now - first >= self.max_delay
+            )
+            if due:
+                for name in due:
+                    del self.pending[name]
+                return due
+            wait = None
+            if self.pending:
+                wait = min(
+                    min(last + self.debounce, first + self.max_delay) - now
+                    for first, last in self.pending.values()
+                )
+            if deadline is not None:
+                if now >= deadline:
+                    return []
+                wait = deadline - now if wait is None else min(wait, deadline - now)
+            for event in self.inotify.read(max(wait, 0) if wait is not None else None):
+                now = time.monotonic()
+                for name in self.handle_event(*event) or []:
+                    first, _ = self.pending.get(name, (now, now))
+                    self.pending[name] = (first, now)
+
+    def run(self, callback):
+        """
+        Call ``callback`` with the list of repositories to refresh each
+        time some are due (until interrupted).
+
+        :param callback: refresh function
+        :type callback: function
+        """
+        while True:
+            callback(self.poll())
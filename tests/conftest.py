@@ -50,3 +50,30 @@ def tmpdir_session(request, tmp_path_factory):
     """A tmpdir fixture for the session scope. Persists throughout the pytest session."""
 
     return tmp_path_factory.mktemp(tmp_path_factory.getbasetemp().name)
+
+
+@pytest.fixture
+def git(monkeypatch):
+    """Return a function that runs a git command (with a test identity) in a repo"""
+
+    for var in ('GIT_AUTHOR', 'GIT_COMMITTER'):
+        monkeypatch.setenv(f'{var}_NAME', 'repolite')
+        monkeypatch.setenv(f'{var}_EMAIL', 'repolite@example.com')
+
+    def run_git(repo_dir, *args):
+        subprocess.check_call(['git', *args], cwd=repo_dir, stdout=subprocess.DEVNULL)
+
+    return run_git
+
+
+@pytest.fixture
+def git_repo(git):
+    """Return a function that creates a git repo with an empty commit on main"""
+
+    def make_repo(repo_dir):
+        repo_dir.mkdir(parents=True)
+        git(repo_dir, 'init', '-q', '-b', 'main')
+        git(repo_dir, 'commit', '-q', '--allow-empty', '-m', 'first')
+        return repo_dir
+
+    return make_repo
@@ -0,0 +1,129 @@
+import os
+import socket
+import stat
+import tempfile
+import threading
+import time
+from pathlib import Path
+from shutil import rmtree
+
+import pytest
+
+from repolite.daemon import *
+from repolite.tracing import start_trace, stop_trace
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, 'AF_UNIX'), reason='unix sockets are not available'
+)
+
+CFG = """\
+top_dir: ext
+repos:
+  - repo_name: bugs
+    repo_url: bugs
+    repo_branch: main
+  - repo_name: elmer
+    repo_url: elmer
+    repo_branch: main
+    repo_groups: [hunters]
+"""
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch, git_repo):
+    for name in ('bugs', 'elmer'):
+        git_repo(tmp_path / 'ext' / name)
+    cfgfile = tmp_path / '.repolite.yml'
+    cfgfile.write_text(CFG, encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('REPO_CFG', str(cfgfile))
+
+    server = RepoDaemon(cfgfile)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if daemon_request(server.sock_path, {'cmd': 'ping'}):
+            break
+        time.sleep(0.05)
+    yield server
+    daemon_request(server.sock_path, {'cmd': 'stop'})
+    thread.join(5)
+    assert not server.sock_path.exists()
+
+
+def query(server, cmd, **kwargs):
+    request = {'cmd': cmd, 'config': str(server.cfgfile), 'cwd': str(Path.cwd())}
+    return daemon_request(server.sock_path, {**request, **kwargs})
+
+
+def test_socket_path(tmp_path):
+    cfgfile = tmp_path / '.repolite.yml'
+    assert get_socket_path(cfgfile) == tmp_path / '.repolite.yml.sock'
+    long_dir = tmp_path / ('x' * 120)
+    sock_path = get_socket_path(long_dir / 'deps.yml')
+    assert sock_path.parent == Path(tempfile.gettempdir(), f'repolite-{os.getuid()}')
+    assert daemon_request(tmp_path / 'nothing.sock', {'cmd': 'ping'}) is None
+
+
+def test_socket_owner(daemon, monkeypatch):
+    assert stat.S_IMODE(daemon.sock_path.stat().st_mode) == 0o600
+    assert daemon_request(daemon.sock_path, {'cmd': 'ping'})['ok']
+    # a socket owned by someone else is never used
+    other_uid = daemon.sock_path.stat().st_uid + 1
+    with monkeypatch.context() as mpatch:
+        mpatch.setattr(os, 'getuid', lambda: other_uid)
+        assert daemon_request(daemon.sock_path, {'cmd': 'ping'}) is None
+
+
+def test_cat_file(tmp_path, git, git_repo):
+    repo_dir = git_repo(tmp_path / 'bugs')
+    helper = CatFile(repo_dir)
+    head = helper.resolve('HEAD')
+    assert helper.resolve('refs/tags/1.0') is None
+    assert helper.resolve('bad name') is None
+    git(repo_dir, 'tag', '1.0')
+    git(repo_dir, 'commit', '-q', '--allow-empty', '-m', 'second')
+    # the same helper process sees the new refs
+    assert helper.resolve('refs/tags/1.0') == head
+    assert helper.resolve('HEAD') != head
+    helper.close()
+
+
+def test_daemon_queries(daemon, tmp_path, git):
+    assert query(daemon, 'check') == {
+        'ok': True,
+        'valid': True,
+        'top_dir': str(tmp_path / 'ext'),
+    }
+    response = query(daemon, 'show', groups=['hunters'])
+    assert [x['name'] for x in response['repos']] == ['elmer']
+    assert response['repos'][0]['branch'] == 'main'
+
+    git(tmp_path / 'ext' / 'bugs', 'tag', '1.0')
+    response = query(daemon, 'has-tag', tag='1.0')
+    assert response['repos'] == {'bugs': True, 'elmer': False}
+
+    tracer = start_trace()
+    try:
+        response = query(daemon, 'lock', only=['bugs'])
+    finally:
+        stop_trace()
+    assert list(response['repos']) == ['bugs']
+    assert [x['step'] for x in tracer.events] == ['git checkout']
+    locked = (tmp_path / '.repolite-locked.yml').read_text(encoding='utf-8')
+    assert response['repos']['bugs']['repo_hash'] in locked
+
+    # requests for another config or work dir are refused
+    response = query(daemon, 'show', cwd='/')
+    assert not response['ok']
+    assert not query(daemon, 'show', only=['daffy'])['ok']
+
+    # config changes are picked up
+    (tmp_path / 'ext' / 'daffy').mkdir()
+    assert query(daemon, 'check')['valid'] is False
+    cfgfile = tmp_path / '.repolite.yml'
+    cfgfile.write_text(CFG + '  - repo_name: daffy\n', encoding='utf-8')
+    assert not query(daemon, 'check')['ok']
+    cfgfile.write_text(CFG.replace('elmer', 'daffy'), encoding='utf-8')
+    rmtree(tmp_path / 'ext' / 'elmer')
+    assert query(daemon, 'check')['valid'] is True
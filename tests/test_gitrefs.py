@@ -0,0 +1,87 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from repolite.gitrefs import *
+from repolite.repolite import get_head_tags, get_ref_hash, get_repo_head
+
+
+def git_out(args, cwd):
+    return subprocess.check_output(['git'] + args, cwd=cwd, text=True).strip()
+
+
+@pytest.fixture
+def repo_clone(script_loc, tmp_path):
+    """Clone daffy and add some loose and packed tags"""
+    src_repo = Path(script_loc, 'testdata', 'daffy').resolve()
+    repo_dir = tmp_path / 'daffy'
+    subprocess.check_call(['git', 'clone', '-q', str(src_repo), str(repo_dir)])
+    env = ['-c', 'user.name=test', '-c', 'user.email=test@example.com']
+    subprocess.check_call(['git'] + env + ['tag', '-a', 'packed-a', '-m', 'a'], cwd=repo_dir)
+    subprocess.check_call(['git', 'tag', 'packed-l', 'HEAD~1'], cwd=repo_dir)
+    subprocess.check_call(['git', 'pack-refs', '--all'], cwd=repo_dir)
+    subprocess.check_call(['git'] + env + ['tag', '-a', 'loose-a', '-m', 'b'], cwd=repo_dir)
+    subprocess.check_call(['git', 'tag', 'loose-l'], cwd=repo_dir)
+    return repo_dir
+
+
+def test_read_head(repo_clone):
+    git_dir = find_git_dir(repo_clone)
+    branch, head = read_head(git_dir)
+    assert branch == git_out(['rev-parse', '--abbrev-ref', 'HEAD'], repo_clone)
+    assert head == git_out(['rev-parse', 'HEAD'], repo_clone)
+
+    subprocess.check_call(['git', 'checkout', '-q', 'HEAD~2'], cwd=repo_clone)
+    branch, head = read_head(git_dir)
+    assert branch is None
+    assert head == git_out(['rev-parse', 'HEAD'], repo_clone)
+    assert get_repo_head(repo_clone) == (head, 'HEAD')
+
+
+def test_resolve_refs(repo_clone):
+    git_dir = find_git_dir(repo_clone)
+    for ref_name in (
+        'refs/tags/packed-a',
+        'refs/tags/packed-l',
+        'refs/tags/loose-a',
+        'refs/remotes/origin/branch1',
+    ):
+        assert resolve_ref(git_dir, ref_name) == git_out(['rev-parse', ref_name], repo_clone)
+    assert resolve_ref(git_dir, 'refs/tags/missing') is None
+    assert get_ref_hash(repo_clone, 'refs/tags/missing') is None
+    assert sorted(list_refs(git_dir)) == [
+        'refs/tags/loose-a',
+        'refs/tags/loose-l',
+        'refs/tags/packed-a',
+        'refs/tags/packed-l',
+    ]
+
+
+def test_tags_at_commit(repo_clone):
+    git_dir = find_git_dir(repo_clone)
+    _, head = read_head(git_dir)
+    expected = git_out(['tag', '--points-at', 'HEAD'], repo_clone).splitlines()
+    assert tags_at_commit(git_dir, head) == sorted(expected)
+    assert get_head_tags(repo_clone) == sorted(expected)
+    assert 'packed-l' not in expected
+
+
+def test_gitfile_worktree(repo_clone, tmp_path):
+    wt_dir = tmp_path / 'wt'
+    subprocess.check_call(
+        ['git', 'worktree', 'add', '-q', '--detach', str(wt_dir), 'HEAD~3'], cwd=repo_clone
+    )
+    git_dir = find_git_dir(wt_dir)
+    assert git_dir is not None
+    assert git_dir != get_common_dir(git_dir)
+    branch, head = read_head(git_dir)
+    assert branch is None
+    assert head == git_out(['rev-parse', 'HEAD'], wt_dir)
+    assert resolve_ref(git_dir, 'refs/tags/loose-l') == git_out(
+        ['rev-parse', 'loose-l'], wt_dir
+    )
+
+
+def test_no_git_dir(tmp_path):
+    assert find_git_dir(tmp_path) is None
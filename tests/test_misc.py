@@ -1,5 +1,6 @@
 import logging
 import os
+import subprocess
 from pathlib import Path
 
 import pytest
@@ -31,6 +32,27 @@ def test_url_check():
     assert url == url3
 
 
+def test_clone_filter():
+    item = Munch(repo_name='daffy', repo_opts=[])
+    assert get_clone_filter(item) is None
+    for spec in ('blob:none', 'tree:0', 'blob:limit=1m'):
+        item.repo_opts = [f'filter={spec}']
+        assert get_clone_filter(item) == spec
+    item.repo_opts = ['--filter=blob:none']
+    assert get_clone_filter(item) == 'blob:none'
+
+
+def test_clone_filter_bogus():
+    item = Munch(repo_name='daffy', repo_opts=['filter=sparse:oid=abc'])
+    with pytest.raises(ValueError) as excinfo:
+        get_clone_filter(item)
+    assert 'unsupported clone filter' in str(excinfo.value)
+    item.repo_opts = ['single-branch']
+    with pytest.raises(ValueError) as excinfo:
+        get_clone_filter(item)
+    assert 'unknown repo_opts item' in str(excinfo.value)
+
+
 def test_resolve_top_dir(tmp_path):
     d = tmp_path / "proj"
     d.mkdir()
@@ -69,5 +91,117 @@ def test_parse_config():
     popts, _ = load_config()
     flag_list, repo_list = parse_config(popts)
     assert 'ext' in flag_list
-    assert isinstance(repo_list[0], Munch)
+    assert isinstance(repo_list[0], RepoSpec)
     # print(repo_list)
+
+
+def test_install_with_pip(monkeypatch):
+    """Install targets should be batched into one pip command"""
+    calls = []
+
+    def fake_cmd(cmd, **kwargs):
+        calls.append(cmd)
+        return b''
+
+    monkeypatch.setattr(subprocess, 'check_call', fake_cmd)
+    monkeypatch.setattr(subprocess, 'check_output', fake_cmd)
+    install_with_pip([Path('ext', 'foo'), Path('ext', 'bar')])
+    assert len(calls) == 2
+    assert calls[0][-3:] == ['install', str(Path('ext', 'foo')), str(Path('ext', 'bar'))]
+    assert calls[1][-1] == 'freeze'
+
+    calls.clear()
+    install_with_pip([], quiet=True)
+    assert not calls
+
+    install_with_pip(Path('foo.whl'), quiet=True, force=True)
+    assert calls[0][-4:] == ['install', '--force-reinstall', '--no-deps', 'foo.whl']
+
+
+# generous ceiling (the target is well under 100 ms) so slow CI hosts pass
+IMPORT_BUDGET_US = 500000  # cumulative import time
+SLOW_MODULES = ('munch', 'yaml', 'importlib.metadata', 'concurrent.futures', 'argparse')
+
+
+@pytest.mark.parametrize('module', ['repolite', 'repolite.repolite'])
+def test_import_budget(module):
+    """Importing the package should be fast and skip slow (unused) dependencies"""
+    import sys
+
+    code = f'import sys, {module}; print(" ".join(sorted(sys.modules)))'
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    loaded = proc.stdout.split()
+    assert [x for x in SLOW_MODULES if x in loaded] == []
+    line = [x for x in proc.stderr.splitlines() if x.endswith(f'| {module}')][0]
+    assert int(line.split('|')[1]) < IMPORT_BUDGET_US
+
+
+def test_dump_config_imports(monkeypatch):
+    """Dumping the config should not parse it or look up the version"""
+    import sys
+
+    code = (
+        'import sys\n'
+        'from repolite.repolite import main\n'
+        'sys.argv = ["repolite", "--dump-config"]\n'
+        'try:\n'
+        '    main()\n'
+        'except SystemExit:\n'
+        '    pass\n'
+        'sys.stderr.write(" ".join(sorted(sys.modules)))\n'
+    )
+    monkeypatch.delenv('REPO_CFG', raising=False)
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    assert 'repo_name:' in proc.stdout
+    assert [x for x in SLOW_MODULES[:3] if x in proc.stderr.split()] == []
+
+
+def test_lazy_version():
+    import repolite
+
+    assert repolite.__version__
+    with pytest.raises(AttributeError):
+        repolite.bogus
+
+
+def test_load_config_cache(tmp_path, monkeypatch):
+    """Unchanged configs should load from the compiled cache"""
+    import repolite.repolite as rl
+
+    cfg_file = tmp_path / 'deps.yml'
+    example = Path('src', 'repolite', 'data', 'example.yml').read_text()
+    cfg_file.write_text(example)
+    monkeypatch.setenv('REPO_CFG', str(cfg_file))
+
+    popts, pfile = load_config()
+    cache_file = tmp_path / '.deps.yml.cache.json'
+    assert cache_file.exists()
+    assert pfile == cfg_file
+
+    def no_yaml(text):
+        raise AssertionError('config should not be parsed')
+
+    monkeypatch.setattr(rl, 'load_yaml', no_yaml)
+    cached, _ = load_config()
+    assert isinstance(cached, Munch)
+    assert cached == popts
+    assert isinstance(cached.repos[0], RepoSpec)
+
+    monkeypatch.undo()
+    monkeypatch.setenv('REPO_CFG', str(cfg_file))
+    cfg_file.write_text(example.replace('top_dir: ext', 'top_dir: deps'))
+    changed, _ = load_config()
+    assert changed.top_dir == 'deps'
+
+    cache_file.write_text('not json')
+    assert load_config()[0] == changed
+
+    # the packaged default is never cached
+    monkeypatch.delenv('REPO_CFG')
+    _, pfile = load_config()
+    assert not list(pfile.parent.glob('*.cache.json'))
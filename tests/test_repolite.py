@@ -1,5 +1,6 @@
 import logging
 import os
+import subprocess
 from pathlib import Path, PurePath
 
 import pytest
@@ -146,6 +147,92 @@ def test_repolite_update(script_loc, tmpdir_session):
     process_git_repos(flag_list, repo_list, update, quiet)
 
 
+def test_repolite_status(tmpdir_session):
+    """
+    Check the status collector (after updating daffy to branch2).
+    """
+    repo_dir = tmpdir_session / 'ext' / 'daffy'
+    status = get_repo_status(repo_dir)
+    assert status.name == 'daffy'
+    assert status.branch == 'branch2'
+    assert len(status.head) == 40
+    assert not status.dirty
+    assert not status.describe.endswith('-dirty')
+
+    tracked = repo_dir / 'main.1'
+    orig_text = tracked.read_text()
+    tracked.write_text('changed')
+    status = get_repo_status(repo_dir)
+    tracked.write_text(orig_text)
+    assert status.dirty
+    assert status.describe.endswith('-dirty')
+
+
+def test_repolite_update_jobs(script_loc, tmpdir_session):
+    """
+    Update the repos in the test config using the worker pool.
+    """
+    cfg.top_dir = str(tmpdir_session / 'ext')
+
+    flag_list, repo_list = parse_config(cfg)
+    git_cmd, lfs_cmd = check_for_git()
+    flag_list.append(lfs_cmd)
+    ulock = False
+    flag_list.append(ulock)
+
+    update = True
+    quiet = True
+    process_git_repos(flag_list, repo_list, update, quiet, jobs=2)
+
+
+def test_repolite_update_jobs_failed(script_loc, tmpdir_session):
+    """
+    Parallel update should summarize failures instead of stopping.
+    """
+    cfg.top_dir = str(tmpdir_session / 'ext')
+
+    flag_list, repo_list = parse_config(cfg)
+    git_cmd, lfs_cmd = check_for_git()
+    flag_list.append(lfs_cmd)
+    ulock = False
+    flag_list.append(ulock)
+
+    repo_list = [Munch(x) for x in repo_list]
+    repo_list[0].repo_branch = 'no-such-branch'
+
+    with pytest.raises(RepoProcessError) as excinfo:
+        process_git_repos(flag_list, repo_list, True, True, jobs=2)
+    assert 'daffy' in str(excinfo.value)
+    assert 'porky' not in str(excinfo.value)
+
+
+def test_repolite_update_probe(script_loc, tmpdir_session, caplog):
+    """
+    Update with remote probing should skip repos that are already current.
+    """
+    cfg.top_dir = str(tmpdir_session / 'ext')
+
+    flag_list, repo_list = parse_config(cfg)
+    git_cmd, lfs_cmd = check_for_git()
+    flag_list.append(lfs_cmd)
+    ulock = False
+    flag_list.append(ulock)
+
+    top_dir = Path(cfg.top_dir)
+    for item in repo_list:
+        assert check_repo_current(item, top_dir)
+
+    porky_dir = top_dir / 'porky'
+    subprocess.check_call(['git', 'reset', '-q', '--hard', 'HEAD~1'], cwd=porky_dir)
+    assert not check_repo_current(repo_list[1], top_dir)
+
+    caplog.set_level(logging.INFO)
+    process_git_repos(flag_list, repo_list, True, True, jobs=2, probe=True)
+    assert 'Repository daffy is up-to-date' in caplog.text
+    assert 'Repository porky is up-to-date' not in caplog.text
+    assert check_repo_current(repo_list[1], top_dir)
+
+
 def test_repolite_tag(script_loc, tmpdir_session):
     """
     Update the repos in the test config.
@@ -171,6 +258,9 @@ def test_repolite_tag(script_loc, tmpdir_session):
 
     tag = 'v9.9.9'
     create_repo_tags(cfg, tag)
+    # plain Munch repo items work too
+    assert check_repo_tags(cfg, tag) == {'daffy': True, 'porky': True}
+    assert check_repo_tags(cfg, 'v0.0.0') == {'daffy': False, 'porky': False}
     tag = None
     for repo in cfg.repos:
         if repo.repo_name == 'daffy':
@@ -231,3 +321,451 @@ def test_repolite_changes(script_loc, tmpdir_session):
     for fpath in changelogs:
         print(fpath)
         assert 'CHANGELOG.rst' in str(fpath)
+
+
+def test_repolite_partial_clone(script_loc, tmp_path):
+    """
+    Sync a repo using a partial clone filter from repo_opts.
+    """
+    src_repo = Path(script_loc, 'testdata', 'daffy').resolve()
+    bare_repo = tmp_path / 'daffy.git'
+    subprocess.check_call(['git', 'clone', '-q', '--bare', str(src_repo), str(bare_repo)])
+    subprocess.check_call(
+        ['git', 'config', 'uploadpack.allowFilter', 'true'], cwd=bare_repo
+    )
+
+    pcfg = Munch.fromYAML(repo_cfg)
+    pcfg.top_dir = str(tmp_path / 'ext')
+    pcfg.repos = pcfg.repos[:1]
+    pcfg.repos[0].repo_url = str(bare_repo)
+    pcfg.repos[0].repo_opts = ['filter=blob:none']
+
+    flag_list, repo_list = parse_config(pcfg)
+    flag_list.extend([None, False])
+    process_git_repos(flag_list, repo_list, False, True)
+
+    repo_dir = tmp_path / 'ext' / 'daffy'
+    filter_cfg = subprocess.check_output(
+        ['git', 'config', 'remote.origin.partialclonefilter'], cwd=repo_dir, text=True
+    )
+    assert filter_cfg.strip() == 'blob:none'
+    process_git_repos(flag_list, repo_list, True, True)
+
+
+def test_repolite_state_cache(tmpdir_session):
+    """
+    Check the workspace state file is maintained and refreshed when stale.
+    """
+    cfg.top_dir = str(tmpdir_session / 'ext')
+    top_dir = Path(cfg.top_dir)
+    assert check_repo_state(cfg)
+
+    state = load_repo_state(top_dir)
+    assert sorted(state['dirs']) == ['daffy', 'porky']
+    assert state['repos']['porky']['synced']
+    assert state['repos']['porky']['remote_tip']
+
+    porky_dir = top_dir / 'porky'
+    head = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=porky_dir, text=True)
+    repo_state = get_repo_state(top_dir, ['daffy', 'porky'])
+    assert repo_state['porky']['head'] == head.strip()
+
+    subprocess.check_call(['git', 'checkout', '-q', 'branch1~1'], cwd=porky_dir)
+    repo_state = get_repo_state(top_dir, ['porky'])
+    subprocess.check_call(['git', 'checkout', '-q', head.strip()], cwd=porky_dir)
+    assert repo_state['porky']['head'] != head.strip()
+    assert repo_state['porky']['branch'] == 'HEAD'
+    assert repo_state['porky']['synced']
+
+
+def test_repolite_remote_locked_cfg(tmp_path, script_loc, monkeypatch):
+    """
+    Write locked config from the remotes, without a workspace.
+    """
+    rcfg = Munch.fromYAML(repo_cfg)
+    rcfg.top_dir = str(tmp_path / 'ext')
+    pfile = Path('.repolite-pytest.yml')
+
+    for repo in rcfg.repos:
+        repo.repo_url = str(Path(script_loc, 'testdata', repo.repo_url).resolve())
+
+    create_remote_locked_cfg(rcfg, pfile, test=str(tmp_path))
+    assert not Path(rcfg.top_dir).exists()
+
+    locked = Munch.fromYAML((tmp_path / '.repolite-pytest-locked.yml').read_text())
+    for repo in locked.repos:
+        head = subprocess.check_output(
+            ['git', 'rev-parse', repo.repo_branch], cwd=repo.repo_url, text=True
+        )
+        assert repo.repo_hash == head.strip()
+
+    # relative urls are relative to top_dir, not the current directory
+    rel_hashes = [x.repo_hash for x in locked.repos]
+    for repo in rcfg.repos:
+        repo.repo_url = os.path.relpath(repo.repo_url, rcfg.top_dir)
+    work_dir = tmp_path / 'work' / 'sub' / 'dir'
+    work_dir.mkdir(parents=True)
+    monkeypatch.chdir(work_dir)
+    create_remote_locked_cfg(rcfg, pfile, test=str(tmp_path))
+    locked = Munch.fromYAML((tmp_path / '.repolite-pytest-locked.yml').read_text())
+    assert [x.repo_hash for x in locked.repos] == rel_hashes
+
+    rcfg.repos[0].repo_branch = 'no-such-branch'
+    with pytest.raises(RepoProcessError) as excinfo:
+        create_remote_locked_cfg(rcfg, pfile, test=str(tmp_path))
+    assert 'daffy' in str(excinfo.value)
+
+
+def test_repolite_locked_fetch(script_loc, tmp_path):
+    """
+    Sync and update with a locked config should fetch only the pinned commit.
+    """
+    src_repo = Path(script_loc, 'testdata', 'porky').resolve()
+    old_hash = subprocess.check_output(
+        ['git', 'rev-parse', 'branch1~2'], cwd=src_repo, text=True
+    ).strip()
+    new_hash = subprocess.check_output(
+        ['git', 'rev-parse', 'branch1'], cwd=src_repo, text=True
+    ).strip()
+
+    lcfg = Munch.fromYAML(repo_cfg)
+    lcfg.top_dir = str(tmp_path / 'ext')
+    lcfg.repos = lcfg.repos[1:]
+    # relative to top_dir, as for clone
+    lcfg.repos[0].repo_url = os.path.relpath(src_repo, lcfg.top_dir)
+    lcfg.repos[0].repo_hash = 'f' * 40
+
+    flag_list, repo_list = parse_config(lcfg)
+    flag_list.extend([None, True])
+    repo_dir = tmp_path / 'ext' / 'porky'
+    with pytest.raises(subprocess.CalledProcessError):
+        process_git_repos(flag_list, repo_list, False, True)
+    # a failed fetch does not leave a half-initialized repo behind
+    assert not repo_dir.exists()
+
+    repo_list[0].repo_hash = old_hash
+    process_git_repos(flag_list, repo_list, False, True)
+    assert get_repo_head(repo_dir)[0] == old_hash
+    remote_url = subprocess.check_output(
+        ['git', 'remote', 'get-url', 'origin'], cwd=repo_dir, text=True
+    )
+    assert remote_url.strip() == str(src_repo)
+    assert (repo_dir / '.git' / 'shallow').exists()
+    commits = subprocess.check_output(['git', 'rev-list', '--count', 'HEAD'], cwd=repo_dir)
+    assert int(commits) == 1
+
+    repo_list[0].repo_hash = new_hash
+    process_git_repos(flag_list, repo_list, True, True)
+    assert get_repo_head(repo_dir)[0] == new_hash
+
+
+def test_repolite_bundles(script_loc, tmpdir_session, tmp_path, caplog):
+    """
+    Export bundles from the test workspace and seed new workspaces from them.
+    """
+    cfg.top_dir = str(tmpdir_session / 'ext')
+    bundle_dir = tmp_path / 'bundles'
+    export_repo_bundles(cfg, bundle_dir, quiet=True)
+    assert sorted(x.name for x in bundle_dir.iterdir()) == [
+        'daffy.bundle',
+        'porky.bundle',
+    ]
+
+    for reachable in (False, True):
+        scfg = Munch.fromYAML(repo_cfg)
+        scfg.top_dir = str(tmp_path / f'ext-{reachable}')
+        for repo in scfg.repos:
+            src_repo = Path(script_loc, 'testdata', repo.repo_url).resolve()
+            # relative to top_dir, as for clone
+            repo.repo_url = os.path.relpath(src_repo, scfg.top_dir)
+            if not reachable:
+                repo.repo_url = str(tmp_path / 'nowhere')
+
+        flag_list, repo_list = parse_config(scfg)
+        flag_list.extend([None, False])
+        caplog.clear()
+        process_git_repos(flag_list, repo_list, False, True, bundle_dir=bundle_dir)
+        assert ('is not reachable' in caplog.text) is not reachable
+
+        for repo in scfg.repos:
+            src_repo = Path(script_loc, 'testdata', repo.repo_name)
+            src_head = subprocess.check_output(
+                ['git', 'rev-parse', repo.repo_branch], cwd=src_repo, text=True
+            )
+            repo_dir = Path(scfg.top_dir, repo.repo_name)
+            head, branch = get_repo_head(repo_dir)
+            assert head == src_head.strip()
+            assert branch == repo.repo_branch
+            if reachable:
+                remote_url = subprocess.check_output(
+                    ['git', 'remote', 'get-url', 'origin'], cwd=repo_dir, text=True
+                )
+                assert remote_url.strip() == str(src_repo.resolve())
+
+
+def test_repolite_install_cache(tmpdir_session, monkeypatch):
+    """
+    Install should build/cache wheels by commit and skip unchanged repos.
+    """
+    import sys
+    from importlib.metadata import version
+
+    real_check_call = subprocess.check_call
+    real_check_output = subprocess.check_output
+    pip_cmds = []
+    install_cmds = []
+
+    def fake_pip(cmd, **kwargs):
+        if cmd[0] != sys.executable:
+            return real_check_call(cmd, **kwargs)
+        pip_cmds.append(cmd[3])
+        if cmd[3] == 'install':
+            install_cmds.append(cmd)
+        if cmd[3] == 'wheel':
+            wheel_dir = Path(cmd[cmd.index('-w') + 1])
+            wheel_dir.mkdir(parents=True, exist_ok=True)
+            (wheel_dir / f'munch-{version("munch")}-py3-none-any.whl').write_bytes(b'')
+        return 0
+
+    def fake_output(cmd, **kwargs):
+        if cmd[0] != sys.executable:
+            return real_check_output(cmd, **kwargs)
+        return fake_pip(cmd, **kwargs) and b''
+
+    monkeypatch.setattr(subprocess, 'check_call', fake_pip)
+    monkeypatch.setattr(subprocess, 'check_output', fake_output)
+
+    icfg = Munch.fromYAML(repo_cfg)
+    icfg.top_dir = str(tmpdir_session / 'ext')
+    icfg.repos[0].repo_install = True
+
+    process_repo_install(icfg, True)
+    # the fake wheel has the installed munch version, so it is forced
+    assert pip_cmds == ['wheel', 'install']
+    assert install_cmds[0][4:6] == ['--force-reinstall', '--no-deps']
+    assert check_repo_state(icfg)
+
+    pip_cmds.clear()
+    process_repo_install(icfg, True)
+    assert pip_cmds == []
+
+    # a new commit with the same package version is rebuilt and installed
+    daffy_dir = Path(icfg.top_dir, 'daffy')
+    subprocess.check_call(['git', 'commit', '-q', '--allow-empty', '-m', 'x'], cwd=daffy_dir)
+    try:
+        process_repo_install(icfg, True)
+    finally:
+        subprocess.check_call(['git', 'reset', '-q', '--hard', 'HEAD~1'], cwd=daffy_dir)
+    assert pip_cmds == ['wheel', 'install']
+    assert install_cmds[-1][4:6] == ['--force-reinstall', '--no-deps']
+    pip_cmds.clear()
+
+    tracked = Path(icfg.top_dir, 'daffy', 'main.1')
+    orig_text = tracked.read_text()
+    tracked.write_text('changed')
+    process_repo_install(icfg, True)
+    tracked.write_text(orig_text)
+    assert pip_cmds == ['install']
+    assert '--force-reinstall' not in install_cmds[-1]
+
+
+def test_repolite_changes_cache(script_loc, tmp_path, monkeypatch):
+    """
+    Changelogs should be skipped if unchanged and updated with only the new
+    commit range when new commits land on a tagged HEAD.
+    """
+    src_repo = Path(script_loc, 'testdata', 'daffy').resolve()
+    top_dir = tmp_path / 'ext'
+    repo_dir = top_dir / 'daffy'
+    subprocess.check_call(['git', 'clone', '-q', str(src_repo), str(repo_dir)])
+    subprocess.check_call(['git', 'checkout', '-q', 'HEAD~3'], cwd=repo_dir)
+    subprocess.check_call(['git', 'tag', '1.0.0'], cwd=repo_dir)
+
+    ccfg = Munch.fromYAML(repo_cfg)
+    ccfg.top_dir = str(top_dir)
+    ccfg.repos[1].repo_enable = False
+    chg_file = top_dir / 'daffy-CHANGELOG.rst'
+
+    process_repo_changes(ccfg, jobs=2)
+    assert '1.0.0' in chg_file.read_text()
+
+    calls = []
+    real_generate = generate_change_data
+
+    def track_generate(*args):
+        calls.append(args)
+        return real_generate(*args)
+
+    monkeypatch.setattr('repolite.repolite.generate_change_data', track_generate)
+    process_repo_changes(ccfg)
+    assert calls == []
+
+    subprocess.check_call(['git', 'checkout', '-q', 'main'], cwd=repo_dir)
+    process_repo_changes(ccfg)
+    assert calls[0][-1] == '1.0.0'
+    full_data = subprocess.check_output(['gitchangelog'], cwd=repo_dir, text=True)
+    assert chg_file.read_text() == full_data
+
+
+def test_merge_change_data():
+    """
+    Sections from a new range go first; duplicate sections are not merged.
+    """
+    old = 'Changelog\n=========\n\n\n1.0.0\n-----\n- Old. [t]\n\n\n'
+    new = '(unreleased)\n------------\n- New. [t]\n\n\n'
+    merged = merge_change_data(old, new, 'rst')
+    assert merged == 'Changelog\n=========\n\n\n' + new + '1.0.0\n-----\n- Old. [t]\n\n\n'
+    assert merge_change_data(merged, new, 'rst') is None
+    assert merge_change_data('# Changelog\n\n## 1.0\n', '## 1.1\n', 'md') == (
+        '# Changelog\n\n## 1.1\n## 1.0\n'
+    )
+
+
+def test_repolite_tag_push(script_loc, tmp_path):
+    """
+    Tagging should push only the new tag ref to the configured remote.
+    """
+    src_repo = Path(script_loc, 'testdata', 'daffy').resolve()
+    bare_repo = tmp_path / 'daffy.git'
+    subprocess.check_call(['git', 'clone', '-q', '--bare', str(src_repo), str(bare_repo)])
+    top_dir = tmp_path / 'ext'
+    repo_dir = top_dir / 'daffy'
+    subprocess.check_call(['git', 'clone', '-q', str(bare_repo), str(repo_dir)])
+    subprocess.check_call(['git', 'tag', 'local-only'], cwd=repo_dir)
+
+    tcfg = Munch.fromYAML(repo_cfg)
+    tcfg.top_dir = str(top_dir)
+    tcfg.repos[1].repo_enable = False
+    tcfg.repos[0].repo_push_new_tags = True
+    create_repo_tags(tcfg, '2.0.0', jobs=2)
+
+    remote_tags = subprocess.check_output(['git', 'tag'], cwd=bare_repo, text=True)
+    assert remote_tags.split() == ['2.0.0']
+    assert get_ref_hash(repo_dir, 'refs/tags/2.0.0') is not None
+
+    # existing tags are skipped
+    create_repo_tags(tcfg, '2.0.0')
+
+
+def test_repolite_show_ndjson(tmpdir_session, capsys):
+    """
+    With ndjson output, show emits one JSON line per repository.
+    """
+    import json
+
+    from repolite.results import set_output_format
+
+    cfg.top_dir = str(tmpdir_session / 'ext')
+    set_output_format('ndjson')
+    try:
+        show_repo_state(cfg, jobs=2)
+    finally:
+        set_output_format('text')
+    lines = capsys.readouterr().out.splitlines()
+    results = [json.loads(x) for x in lines]
+    assert sorted(x['repo'] for x in results) == ['daffy', 'porky']
+    assert all(x['command'] == 'show' and len(x['head']) == 40 for x in results)
+
+    with pytest.raises(ValueError):
+        set_output_format('xml')
+
+
+def test_repolite_select_repos(script_loc, tmp_path, tmpdir_session):
+    """
+    Only re-lock the selected repos; others keep their config values.
+    """
+    rcfg = Munch(build_config(Munch.fromYAML(repo_cfg)))
+    rcfg.top_dir = str(tmpdir_session / 'ext')
+    pfile = Path('.repolite-pytest.yml')
+    for repo in rcfg.repos:
+        repo.repo_url = str(Path(script_loc, 'testdata', repo.repo_url).resolve())
+    rcfg.repos[1].repo_hash = 'deadbeef'
+
+    selected = select_repos(rcfg.repos, names=['daffy'])
+    assert [x.repo_name for x in selected] == ['daffy']
+    assert parse_config(rcfg)[1] == selected
+    assert check_repo_state(rcfg)
+
+    create_remote_locked_cfg(rcfg, pfile, test=str(tmp_path))
+    locked = Munch.fromYAML((tmp_path / '.repolite-pytest-locked.yml').read_text())
+    assert len(locked.repos) == 2
+    assert locked.repos[0].repo_hash is not None
+    assert locked.repos[1].repo_hash == 'deadbeef'
+
+
+def test_repolite_optimize(tmp_path, monkeypatch, git, git_repo):
+    """
+    Pack loose objects and combine the smaller packs.
+    """
+    monkeypatch.chdir(tmp_path)
+    repo_dir = git_repo(tmp_path / 'ext' / 'bugs')
+    for num in range(9):
+        (repo_dir / f'file{num}').write_text(f'{num}\n', encoding='utf-8')
+        git(repo_dir, 'add', '.')
+        git(repo_dir, 'commit', '-q', '-m', f'commit {num}')
+        if num % 3 == 2:
+            git(repo_dir, 'repack', '-q')
+    git(repo_dir, 'commit', '-q', '--allow-empty', '-m', 'x')
+    ocfg = Munch(
+        build_config(
+            {'repos': [{'repo_name': 'bugs', 'repo_url': 'bugs', 'repo_branch': 'main'}]}
+        )
+    )
+
+    before, after = optimize_repos(ocfg, quiet=True)['bugs']
+    assert before['count'] > 0 and before['packs'] == 3
+    assert after['count'] == 0
+    # the loose objects were packed, then the smaller packs combined
+    assert after['packs'] < before['packs'] + 1
+    assert after['in-pack'] == before['in-pack'] + 1
+    git_dir = repo_dir / '.git'
+    assert (git_dir / 'objects' / 'pack' / 'multi-pack-index').exists()
+    assert (git_dir / 'objects' / 'info' / 'commit-graphs').is_dir()
+    git(repo_dir, 'fsck', '--no-progress')
+
+
+def test_repolite_update_single_fetch(tmp_path, git, git_repo):
+    """
+    Update runs one fetch per repo, then a local fast-forward or rebase.
+    """
+    upstream = git_repo(tmp_path / 'remotes' / 'bugs')
+    ucfg = Munch(
+        build_config(
+            {
+                'top_dir': str(tmp_path / 'ext'),
+                'repos': [
+                    {'repo_name': 'bugs', 'repo_url': str(upstream), 'repo_branch': 'main'}
+                ],
+            }
+        )
+    )
+    flag_list, repo_list = parse_config(ucfg)
+    flag_list.extend([None, False])
+    process_git_repos(flag_list, repo_list, False, True)
+    repo_dir = tmp_path / 'ext' / 'bugs'
+
+    def update_upstream(msg):
+        git(upstream, 'commit', '-q', '--allow-empty', '-m', msg)
+        git(upstream, 'tag', msg)
+        tracer = start_trace()
+        try:
+            process_git_repos(flag_list, repo_list, True, True)
+        finally:
+            stop_trace()
+        return [x['step'] for x in tracer.events if x['step'].startswith('git')]
+
+    steps = update_upstream('b')
+    assert steps.count('git fetch') == 1
+    assert 'git pull' not in steps
+    assert 'git merge' in steps
+    assert get_repo_head(repo_dir)[0] == get_repo_head(upstream)[0]
+    assert get_ref_hash(repo_dir, 'refs/tags/b')
+
+    # local commits are rebased on top of the new upstream commits
+    git(repo_dir, 'commit', '-q', '--allow-empty', '-m', 'l')
+    repo_list[0].repo_use_rebase = True
+    steps = update_upstream('c')
+    assert steps.count('git fetch') == 1
+    assert 'git rebase' in steps
+    log = subprocess.check_output(['git', 'log', '--format=%s'], cwd=repo_dir, text=True)
+    assert log.split() == ['l', 'c', 'b', 'first']
@@ -0,0 +1,97 @@
+import pytest
+
+from repolite.spec import *
+
+minimal_cfg = {
+    'top_dir': 'ext',
+    'repos': [
+        {'repo_name': 'daffy', 'repo_url': 'daffy', 'repo_branch': 'main'},
+        {
+            'repo_name': 'porky',
+            'repo_alias': 'pig',
+            'repo_url': 'porky',
+            'repo_branch': 'branch1',
+            'repo_create_tag_new': 1.1,
+        },
+    ],
+}
+
+
+def test_build_config_defaults():
+    cfg_data = build_config(minimal_cfg)
+    assert cfg_data['pull_with_rebase'] is False
+    daffy, porky = cfg_data['repos']
+    assert isinstance(daffy, RepoSpec)
+    assert daffy.repo_remote == 'origin'
+    assert daffy.repo_enable is True
+    assert daffy.dir_name == 'daffy'
+    assert porky.dir_name == 'pig'
+    assert porky.repo_create_tag_new == '1.1'
+    assert not hasattr(daffy, '__dict__')
+
+
+def test_spec_defaults_not_shared():
+    spec1 = RepoSpec(repo_name='a', repo_url='a', repo_branch='main')
+    spec2 = RepoSpec(repo_name='b', repo_url='b', repo_branch='main')
+    spec1.repo_opts.append('filter=blob:none')
+    assert spec2.repo_opts == []
+
+
+def test_spec_round_trip():
+    data = minimal_cfg['repos'][1]
+    spec = RepoSpec.from_dict(data)
+    compact = spec.to_dict(compact=True)
+    assert sorted(compact) == sorted(data)
+    assert RepoSpec.from_dict(compact) == spec
+    assert len(spec.to_dict()) == len(REPO_FIELDS)
+
+
+def test_build_config_errors():
+    bad_cfg = {
+        'top_dir': 'ext',
+        'repos': [
+            {'repo_name': 'ok', 'repo_url': 'ok', 'repo_branch': 'main'},
+            {'repo_name': 'typo', 'repo_url': 'x', 'repo_brnach': 'main'},
+            {'repo_name': 'ok', 'repo_url': 'y', 'repo_branch': 'main', 'repo_depth': -1},
+            {'repo_name': 'flag', 'repo_url': 'z', 'repo_branch': 'main', 'repo_enable': 1},
+            'bogus',
+        ],
+    }
+    with pytest.raises(RepoSpecError) as excinfo:
+        build_config(bad_cfg)
+    msg = str(excinfo.value)
+    assert "repos[1] (typo): unknown key 'repo_brnach'" in msg
+    assert "repos[1] (typo): missing required key 'repo_branch'" in msg
+    assert 'repos[2] (ok): repo_depth must not be negative' in msg
+    assert 'repos[3] (flag): repo_enable must be bool' in msg
+    assert 'repos[4]: expected a mapping' in msg
+    assert isinstance(excinfo.value, ValueError)
+
+    with pytest.raises(RepoSpecError, match="duplicate directory name 'ok'"):
+        build_config({'repos': [bad_cfg['repos'][0]] * 2})
+    with pytest.raises(RepoSpecError, match="missing required key 'repos'"):
+        build_config({'top_dir': 'ext'})
+
+
+def test_select_repos():
+    cfg_data = build_config(minimal_cfg)
+    repos = cfg_data['repos']
+    repos[1].repo_groups = ['farm']
+    assert select_repos(repos) == repos
+
+    assert [x.repo_name for x in select_repos(repos, names=['pig'])] == ['porky']
+    assert [x.selected for x in repos] == [False, True]
+    assert enabled_repos(repos) == [repos[1]]
+
+    selected = select_repos(repos, names=['daffy'], groups=['farm'])
+    assert selected == repos
+    assert select_repos(repos, pattern='^d') == [repos[0]]
+
+    with pytest.raises(RepoSpecError, match="unknown repository 'bugs'"):
+        select_repos(repos, names=['bugs'])
+    with pytest.raises(RepoSpecError, match="unknown group 'zoo'"):
+        select_repos(repos, groups=['zoo'])
+    with pytest.raises(RepoSpecError, match='no repositories match'):
+        select_repos(repos, pattern='elmer')
+    # selection is not part of the config data
+    assert 'selected' not in repos[0].to_dict()
@@ -0,0 +1,65 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from repolite.sshmux import *
+
+FAKE_SSH = """\
+import sys, time
+from pathlib import Path
+
+args = sys.argv[1:]
+opts = [args[i + 1] for i, x in enumerate(args) if x == '-o']
+path = [x.split('=', 1)[1] for x in opts if x.startswith('ControlPath=')][0]
+sock = Path(path.replace('%C', args[-1].replace('@', '_')))
+log = Path(sock.parent, 'calls.log')
+with log.open('a') as calls:
+    calls.write(' '.join(args) + '\\n')
+if '-O' in args:
+    cmd = args[args.index('-O') + 1]
+    if cmd == 'exit' and sock.exists():
+        sock.unlink()
+        sys.exit(0)
+    sys.exit(0 if sock.exists() else 255)
+sock.write_text('master')
+while sock.exists():
+    time.sleep(0.05)
+"""
+
+
+def test_get_ssh_host():
+    assert get_ssh_host('git@github.com:sarnold/repolite.git') == ('git', 'github.com', None)
+    assert get_ssh_host('host:repo.git') == (None, 'host', None)
+    assert get_ssh_host('ssh://me@host:2222/r.git') == ('me', 'host', '2222')
+    assert get_ssh_host('git+ssh://host/r.git') == (None, 'host', None)
+    assert get_ssh_host('https://github.com/sarnold/repolite.git') is None
+    assert get_ssh_host('file:///tmp/repo') is None
+    assert get_ssh_host('/tmp/repo') is None
+
+
+def test_ssh_mux(tmp_path, monkeypatch):
+    fake_ssh = tmp_path / 'fake_ssh.py'
+    fake_ssh.write_text(FAKE_SSH)
+    monkeypatch.delenv('GIT_SSH_COMMAND', raising=False)
+    urls = ['git@hostA:foo/bar.git', 'git@hostA:foo/baz.git', 'ssh://hostB/x.git', '/tmp']
+
+    mux = SshMux(urls, ssh_cmd=f'{sys.executable} {fake_ssh}', timeout=5)
+    assert mux.hosts == [('git', 'hostA', None), (None, 'hostB', None)]
+    with mux:
+        sock_dir = Path(mux.sock_dir)
+        assert sorted(x.name for x in sock_dir.glob('*host*')) == ['git_hostA', 'hostB']
+        assert 'ControlMaster=no' in os.environ['GIT_SSH_COMMAND']
+        assert all(x.poll() is None for x in mux.masters.values())
+        procs = list(mux.masters.values())
+    assert 'GIT_SSH_COMMAND' not in os.environ
+    assert all(x.poll() is not None for x in procs)
+    assert not sock_dir.exists()
+
+
+def test_ssh_mux_no_hosts(monkeypatch):
+    monkeypatch.setenv('GIT_SSH_COMMAND', 'ssh -i key')
+    with SshMux(['https://example.com/repo.git']) as mux:
+        assert mux.sock_dir is None
+    assert os.environ['GIT_SSH_COMMAND'] == 'ssh -i key'
@@ -0,0 +1,40 @@
+import json
+import subprocess
+
+import pytest
+
+from repolite.repolite import finish_trace, get_ref_hash
+from repolite.tracing import *
+
+
+def test_step_names():
+    assert get_step_name(['git', '-C', 'foo', 'fetch', 'origin']) == 'git fetch'
+    assert get_step_name(['/usr/bin/python3', '-m', 'pip', 'wheel', '.']) == 'pip wheel'
+    assert get_step_name(['gitchangelog', 'v1..']) == 'gitchangelog'
+
+
+def test_run_traced(tmp_path):
+    assert run_traced(subprocess.check_output, ['git', '--version'], text=True)
+    tracer = start_trace()
+    try:
+        with trace_repo('daffy'):
+            run_traced(subprocess.check_call, ['git', 'init', '-q', str(tmp_path)])
+        run_traced(subprocess.run, ['git', 'status'], cwd=tmp_path, capture_output=True)
+        with pytest.raises(subprocess.CalledProcessError):
+            run_traced(subprocess.check_call, ['git', 'bogus-cmd'], cwd=tmp_path)
+    finally:
+        assert stop_trace() is tracer
+
+    repos = [x['repo'] for x in tracer.events]
+    assert repos == ['daffy', tmp_path.name, tmp_path.name]
+    assert [x['status'] for x in tracer.events][:2] == [0, 0]
+    assert tracer.events[2]['status'] != 0
+    assert len(tracer.slowest(2)) == 2
+
+    trace_file = tmp_path / 'trace.json'
+    start_trace().events = tracer.events
+    finish_trace(trace_file, 2)
+    data = json.loads(trace_file.read_text())
+    assert [x['name'] for x in data['traceEvents']][0] == 'daffy: git init'
+    assert all(x['ph'] == 'X' and x['dur'] >= 0 for x in data['traceEvents'])
+    assert get_tracer() is None
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+
+import pytest
+
+from repolite.repolite import (
+    DirectoryTypeError,
+    acquire_watch_lock,
+    get_repo_state,
+    get_watched_status,
+    is_watch_active,
+    refresh_repo_snapshot,
+)
+from repolite.watch import *
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith('linux'), reason='inotify is Linux only'
+)
+
+
+@pytest.fixture
+def workspace(tmp_path, git_repo):
+    top_dir = tmp_path / 'ext'
+    for name in ('bugs', 'elmer'):
+        git_repo(top_dir / name)
+    return top_dir
+
+
+def test_watcher_debounce(workspace, git):
+    with RepoWatcher(workspace, ['bugs', 'elmer'], debounce=0.3) as watcher:
+        assert watcher.poll(timeout=0.1) == []
+        start = time.monotonic()
+        for num in range(5):
+            git(workspace / 'bugs', 'branch', f'topic{num}')
+        git(workspace / 'bugs', 'pack-refs', '--all')
+        # one refresh for the whole burst, only for the changed repo
+        assert watcher.poll(timeout=5) == ['bugs']
+        assert time.monotonic() - start >= 0.3
+        assert watcher.poll(timeout=0.5) == []
+
+        git(workspace / 'elmer', 'commit', '-q', '--allow-empty', '-m', 'second')
+        assert watcher.poll(timeout=5) == ['elmer']
+
+        # new ref directories are watched too
+        git(workspace / 'elmer', 'branch', 'feature/one')
+        assert watcher.poll(timeout=5) == ['elmer']
+        git(workspace / 'elmer', 'branch', 'feature/two')
+        assert watcher.poll(timeout=5) == ['elmer']
+
+
+def test_watched_snapshot(workspace, git):
+    names = ['bugs', 'elmer']
+    assert get_watched_status(workspace, names) is None
+    refresh_repo_snapshot(workspace, names)
+    assert not is_watch_active(workspace)
+
+    lock_file = acquire_watch_lock(workspace)
+    assert is_watch_active(workspace)
+    with pytest.raises(DirectoryTypeError, match=f'pid {os.getpid()}'):
+        acquire_watch_lock(workspace)
+    statuses = get_watched_status(workspace, names)
+    assert [x.name for x in statuses] == names
+    assert statuses[0].branch == 'main'
+
+    # a change the watcher has not seen yet is not hidden by the snapshot
+    git(workspace / 'bugs', 'commit', '-q', '--allow-empty', '-m', 'second')
+    old_head = statuses[0].head
+    assert get_watched_status(workspace, names) is None
+    assert get_repo_state(workspace, names)['bugs']['head'] != old_head
+    refresh_repo_snapshot(workspace, ['bugs'])
+    assert get_watched_status(workspace, names)[0].head != old_head
+
+    # the lock is gone with the watcher (the lock file is left behind)
+    lock_file.close()
+    assert not is_watch_active(workspace)
+    assert get_watched_status(workspace, names) is None